@@ -3,18 +3,25 @@
 import logging
 import os.path
 import itertools
+import hashlib
+import json
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
-from csirtg_indicator.utils import resolve_itype
+from csirtg_fm.utils.itype import resolve_itype, itype_cache
 from csirtg_indicator.constants import COLUMNS
-from csirtg_indicator import Indicator
 
-from csirtg_fm.constants import CACHE_PATH
+from csirtg_fm.constants import CACHE_PATH, PARSER_SPLIT_SIZE, \
+    PARSER_WORKERS, CHUNK_SIZE, SNAPSHOT_PATH
 from csirtg_fm.utils import load_plugin, \
-    chunk
+    chunk, get_digest, get_size, get_ranges
 from csirtg_fm.constants import FIREBALL_SIZE
 
-from csirtg_fm.utils.rules import load_rules
+from csirtg_fm.utils.rules import load_rules, compile_rule
 from csirtg_fm.utils.indicator import format_keys
+from csirtg_fm.utils.record import Record
+from csirtg_fm.utils.snapshot import Snapshot
 from csirtg_fm.archiver import NOOPArchiver
 
 FORMAT = os.getenv('CSIRTG_FM_FORMAT', 'table')
@@ -28,6 +35,31 @@ logging.getLogger("requests").setLevel(logging.WARNING)
 
 logger = logging.getLogger(__name__)
 
+PARSERS_PATH = os.path.join(os.path.dirname(__file__), 'parsers')
+
+# feeds are parsed while others are still being fetched (threads holding
+# logging and cache locks), the workers can't be forked from that state
+START_METHOD = 'forkserver' \
+    if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+def _parse_range(parser_name, rule, feed, spec, cache, limit, start, end,
+                 skip_invalid):
+    # runs in a worker process
+    parser = load_plugin(PARSERS_PATH, parser_name)
+    parser = parser.Plugin(rule=rule, feed=feed, spec=spec, cache=cache,
+                           limit=limit, start=start, end=end)
+
+    rv = list(parser.process(skip_invalid=skip_invalid))
+    _log_rejected(parser)
+    return rv
+
+
+def _log_rejected(parser):
+    if parser.rejected:
+        logger.info(f"{parser.feed}: rejected {parser.rejected} rows that "
+                    f"aren't a valid {parser.itype or 'indicator'}")
+
 
 class FM(object):
 
@@ -42,6 +74,9 @@ class FM(object):
         self.goback = kwargs.get('goback')
         self.skip_invalid = kwargs.get('skip_invalid')
         self.client = kwargs.get('client')
+        self.force = kwargs.get('force')
+        self.incremental = kwargs.get('incremental')
+        self.snapshot_path = kwargs.get('snapshot_path', SNAPSHOT_PATH)
 
         if self.client and self.client != 'stdout':
             self._init_client()
@@ -61,8 +96,12 @@ class FM(object):
         self.client = self.client.Plugin()
 
     def is_valid(self, i):
+        # resolved, or checked against the rule's itype, by the parser
+        if i.itype:
+            return True
+
         try:
-            resolve_itype(i['indicator'])
+            resolve_itype(i.indicator)
         except TypeError as e:
             if logger.getEffectiveLevel() == logging.DEBUG:
                 if not self.skip_invalid:
@@ -87,6 +126,66 @@ class FM(object):
         logger.debug(f"adding: {i.indicator}/{i.provider}/"
                      f"{i.first_at}/{i.last_at}")
 
+    def _rule_key(self, rule, feed, limit=None):
+        # editing a feed's rule (or limit) re-processes the feed
+        r = {k: v for k, v in rule.items() if k != 'feeds'}
+        return json.dumps([r, rule['feeds'][feed], limit], sort_keys=True,
+                          default=str)
+
+    def get_digest(self, rule, feed, cache, limit=None):
+        d = hashlib.sha256()
+        d.update(self._rule_key(rule, feed, limit).encode('utf-8'))
+        return get_digest(cache, d)
+
+    def is_splittable(self, parser, snapshot=None, limit=None):
+        if PARSER_WORKERS < 2:
+            return False
+
+        # each range would parse up to the limit, only to be thrown away
+        if limit:
+            return False
+
+        # reverse and incremental reads depend on seeing every line in order
+        if getattr(parser, 'reverse', False) or snapshot is not None:
+            return False
+
+        if get_size(parser.cache) < PARSER_SPLIT_SIZE:
+            return False
+
+        return parser.splittable
+
+    def process_ranges(self, parser_name, rule, feed, cache, limit=None,
+                       workers=PARSER_WORKERS, spec=None):
+        """
+        Parse newline aligned byte ranges of the cache in a process pool,
+        results are yielded in file order. Only a couple of ranges per worker
+        are in flight at any one time.
+        """
+        size = max(CHUNK_SIZE, get_size(cache) // (workers * 4))
+        pending = deque()
+
+        if spec is None:
+            spec = compile_rule(rule, feed)
+
+        ctx = multiprocessing.get_context(START_METHOD)
+        with ProcessPoolExecutor(workers, mp_context=ctx) as pool:
+            try:
+                for start, end in get_ranges(cache, size):
+                    pending.append(pool.submit(
+                        _parse_range, parser_name, rule, feed, spec, cache,
+                        limit, start, end, self.skip_invalid))
+
+                    if len(pending) >= workers * 2:
+                        yield from pending.popleft().result()
+
+                while pending:
+                    yield from pending.popleft().result()
+
+            finally:
+                # stopped early (eg: limit)
+                for f in pending:
+                    f.cancel()
+
     def process(self, rule, feed, parser_name, cli, limit=None, indicators=[]):
 
         if isinstance(rule, str):
@@ -95,18 +194,45 @@ class FM(object):
         if rule['feeds'][feed].get('limit') and limit == 25:
             limit = rule['feeds'][feed].get('limit')
 
+        # skip feeds we've already processed in full, unless forced
+        digest = None
+        if cli and not isinstance(self.archiver, NOOPArchiver):
+            key = f"{cli.cache}:{feed}"
+            digest = self.get_digest(rule, feed, cli.cache, limit)
+
+            if not self.force and self.archiver.get_digest(key) == digest:
+                logger.info(f"unchanged, skipping: {feed} - {cli.cache}")
+                return
+
+        # only parse the lines that changed since the last snapshot
+        snapshot = None
+        if self.incremental and cli:
+            snapshot = Snapshot(f"{cli.cache}:{feed}:"
+                                f"{self._rule_key(rule, feed, limit)}",
+                                path=self.snapshot_path)
+
+        parser = None
         if parser_name not in ['csirtg', 'apwg']:
             # detect and load the parser
-            plugin_path = os.path.join(os.path.dirname(__file__), 'parsers')
-            parser = load_plugin(plugin_path, parser_name)
-            parser = parser.Plugin(rule=rule, feed=feed, cache=cli.cache,
-                                   limit=limit)
+            parser = load_plugin(PARSERS_PATH, parser_name)
+            spec = compile_rule(rule, feed)
+            parser = parser.Plugin(rule=rule, feed=feed, spec=spec,
+                                   cache=cli.cache, limit=limit,
+                                   snapshot=snapshot)
 
             # bring up the pipeline
-            indicators = parser.process(skip_invalid=self.skip_invalid)
+            if self.is_splittable(parser, snapshot, limit):
+                logger.info(f"parsing {cli.cache} in parallel")
+                indicators = self.process_ranges(parser_name, rule, feed,
+                                                 cli.cache, limit, spec=spec)
+            else:
+                indicators = parser.process(skip_invalid=self.skip_invalid)
+
+        else:
+            # api feeds hand us dicts
+            indicators = (Record(**i) for i in indicators)
 
         indicators = (i for i in indicators if self.is_valid(i))
-        indicators = (Indicator(**i) for i in indicators)
         indicators = (format_keys(i) for i in indicators)
 
         # check to see if the indicator is too old
@@ -120,6 +246,9 @@ class FM(object):
 
         indicators_batches = chunk(indicators, int(FIREBALL_SIZE))
         for batch in indicators_batches:
+            # the records only become Indicators on the way out
+            batch = [i.to_indicator() for i in batch]
+
             # send batch
             if self.client and self.client != 'stdout':
                 logger.info('sending: %i' % len(batch))
@@ -133,3 +262,14 @@ class FM(object):
 
             # commit
             self.archiver.commit()
+
+        if parser:
+            _log_rejected(parser)
+
+        if digest:
+            self.archiver.set_digest(key, digest)
+
+        if snapshot:
+            snapshot.save()
+
+        logger.debug(f"itype cache: {itype_cache.stats()}")
@@ -20,6 +20,7 @@ from .noop import NOOPArchiver
 # this needs to be done first..
 from csirtg_fm.archiver.constants import BASE
 from .indicator import Indicator
+from .digest import Digest
 
 logger = logging.getLogger(__name__)
 
@@ -183,6 +184,22 @@ class Archiver(object):
 
         return i.id
 
+    def get_digest(self, key):
+        d = self.handle().query(Digest).filter_by(key=key).first()
+        if d:
+            return d.digest
+
+    def set_digest(self, key, digest):
+        s = self.begin()
+
+        d = s.query(Digest).filter_by(key=key).first()
+        if not d:
+            d = Digest(key=key)
+            s.add(d)
+
+        d.digest = digest
+        self.commit()
+
     def cleanup(self, days=CLEANUP_DAYS):
         days = int(days)
         date = arrow.utcnow()
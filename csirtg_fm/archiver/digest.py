@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, DateTime, UnicodeText, Text
+from sqlalchemy.sql.expression import func
+
+from csirtg_fm.archiver.constants import BASE
+
+
+class Digest(BASE):
+    __tablename__ = "digests"
+
+    id = Column(Integer, primary_key=True)
+    key = Column(UnicodeText, index=True, unique=True)
+    digest = Column(Text)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+
+    def __init__(self, key=None, digest=None):
+        self.key = key
+        self.digest = digest
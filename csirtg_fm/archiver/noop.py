@@ -18,5 +18,11 @@ class NOOPArchiver:
     def create(self, indicator):
         pass
 
+    def get_digest(self, key):
+        pass
+
+    def set_digest(self, key, digest):
+        pass
+
     def cleanup(self, days=180):
         return 0
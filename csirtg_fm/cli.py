@@ -20,9 +20,11 @@ from csirtg_indicator.constants import COLUMNS
 from csirtg_fm.constants import FM_RULES_PATH, CACHE_PATH, LOGLEVEL
 from csirtg_fm.utils import setup_logging, get_argument_parser, \
     setup_signals
-from csirtg_fm.content import get_type
+from csirtg_fm.content import get_type, types_cache
 from csirtg_fm import FM
-from csirtg_fm.utils.rules import load_rules
+from csirtg_fm.utils.rules import load_rules, compile_rule
+from csirtg_fm.utils.fetcher import Fetcher
+from csirtg_fm.clients.http import close_sessions
 from csirtg_fm.archiver import Archiver, NOOPArchiver
 
 FORMAT = os.getenv('CSIRTG_FM_FORMAT', 'table')
@@ -67,6 +69,46 @@ def fetch_apwg(f, limit):
     return indicators
 
 
+def _get_parser(cli):
+    parser_name = None
+
+    # decode the content and load the parser
+    try:
+        logger.debug('testing parser: %s' % cli.cache)
+        parser_name = get_type(cli.cache)
+        logger.debug('detected parser: %s' % parser_name)
+
+    except Exception as e:
+        logger.debug(e)
+
+    if cli.rule['feeds'][cli.feed].get('pattern'):
+        logger.debug("overriding parser with pattern..")
+        parser_name = 'pattern'
+
+    if not parser_name:
+        parser_name = compile_rule(cli.rule, cli.feed).parser or 'pattern'
+
+    return parser_name
+
+
+def _process(s, r, f, parser_name, cli, limit, indicators, data=None):
+    if data is None:
+        data = []
+
+    try:
+        for i in s.process(r, f, parser_name, cli, limit=limit,
+                           indicators=data):
+            if not i:
+                continue
+
+            indicators.append(i)
+
+    except Exception as e:
+        logger.error(e)
+        import traceback
+        traceback.print_exc()
+
+
 def _run_fm(args, **kwargs):
     data = kwargs.get('data')
 
@@ -85,7 +127,8 @@ def _run_fm(args, **kwargs):
     logger.info('starting run...')
 
     s = FM(archiver=archiver, client=args.client, goback=goback,
-           skip_invalid=args.skip_invalid)
+           skip_invalid=args.skip_invalid, force=args.force,
+           incremental=args.incremental)
 
     fetch = True
     if args.no_fetch:
@@ -93,6 +136,7 @@ def _run_fm(args, **kwargs):
 
     data = []
     indicators = []
+    clients = []
 
     for r, f, ff in load_rules(args.rule, feed=args.feed):
         if not f:
@@ -152,47 +196,27 @@ def _run_fm(args, **kwargs):
 
         else:
             from .clients.http import Client
-            cli = Client(r, f, verify_ssl=verify_ssl)
 
+            # http feeds are fetched concurrently once the rules are loaded
             logger.info(f"processing: {ff} - {f}")
-            # fetch the feeds
-
-            try:
-                cli.fetch(fetch=fetch)
-
-            except Exception as e:
-                logger.error(e, exc_info=True)
-                continue
-
-            # decode the content and load the parser
-            try:
-                logger.debug('testing parser: %s' % cli.cache)
-                parser_name = get_type(cli.cache)
-                logger.debug('detected parser: %s' % parser_name)
-
-            except Exception as e:
-                logger.debug(e)
-
-            if r['feeds'][f].get('pattern'):
-                logger.debug("overriding parser with pattern..")
-                parser_name = 'pattern'
+            clients.append(Client(r, f, verify_ssl=verify_ssl))
+            continue
 
-            if not parser_name:
-                parser_name = r['feeds'][f].get('parser') or r.get('parser') \
-                              or 'pattern'
+        _process(s, r, f, parser_name, cli, args.limit, indicators,
+                 data=data)
 
-        try:
-            for i in s.process(r, f, parser_name, cli, limit=args.limit,
-                               indicators=data):
-                if not i:
-                    continue
+    # fetch the feeds, parsing each one as soon as its download completes
+    for cli, e in Fetcher().fetch(clients, fetch=fetch):
+        if e:
+            logger.error(e, exc_info=e)
+            continue
 
-                indicators.append(i)
+        parser_name = _get_parser(cli)
+        _process(s, cli.rule, cli.feed, parser_name, cli, args.limit,
+                 indicators)
 
-        except Exception as e:
-            logger.error(e)
-            import traceback
-            traceback.print_exc()
+    close_sessions()
+    types_cache.save()
 
     if args.client == 'stdout':
         for l in FORMATS[args.format](data=indicators,
@@ -261,6 +285,12 @@ def main():
                    default=ARCHIVE_PATH)
     p.add_argument('--remember', help='remember what has been already '
                                       'processed', action='store_true')
+    p.add_argument('--force', help='re-process feeds whose content has not '
+                                   'changed since the last run',
+                   action='store_true')
+    p.add_argument('--incremental', help='only parse lines that changed '
+                                         'since the last run',
+                   action='store_true')
 
     p.add_argument('--client', default='stdout')
 
@@ -3,8 +3,23 @@ import os
 FETCHER_TIMEOUT = os.getenv('CSIRTG_FM_FETCHER_TIMEOUT', 120)
 RETRIES = os.getenv('CSIRTG_FM_FETCHER_RETRIES', 3)
 RETRIES_DELAY = os.getenv('CSIRTG_FM_FETCHER_RETRY_DELAY', 30)  # seconds
+RETRIES_MAX_DELAY = os.getenv('CSIRTG_FM_FETCHER_RETRY_MAX_DELAY', 600)
 NO_HEAD = os.getenv('CSIRTG_FM_FETCHER_NOHEAD')
 
+# concurrent fetching
+FETCHER_WORKERS = os.getenv('CSIRTG_FM_FETCHER_WORKERS', 16)
+FETCHER_HOST_LIMIT = os.getenv('CSIRTG_FM_FETCHER_HOST_LIMIT', 2)
+
+# per-host token bucket, requests per second (0 disables)
+FETCHER_HOST_RATE = os.getenv('CSIRTG_FM_FETCHER_HOST_RATE', 1)
+FETCHER_HOST_BURST = os.getenv('CSIRTG_FM_FETCHER_HOST_BURST', 4)
+
+# shared per-host connection pools
+FETCHER_POOL_SIZE = os.getenv('CSIRTG_FM_FETCHER_POOL_SIZE', 4)
+FETCHER_KEEPALIVE = True
+if os.getenv('CSIRTG_FM_FETCHER_KEEPALIVE', '1') == '0':
+    FETCHER_KEEPALIVE = False
+
 TRACE = False
 if os.getenv('CSIRTG_FM_HTTP_TRACE', '0') == '1':
     TRACE = True
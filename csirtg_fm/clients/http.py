@@ -1,16 +1,24 @@
+import hashlib
+import json
 import logging
 import os
-from datetime import datetime
 import re
-from time import sleep
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
 import arrow
 import requests
+from requests.adapters import HTTPAdapter
 
-from csirtg_fm.constants import VERSION, FM_CACHE, RE_CACHE_TYPES, RE_FQDN
-from csirtg_fm.clients.constants import FETCHER_TIMEOUT, RETRIES, \
-    RETRIES_DELAY, NO_HEAD, TRACE
+from csirtg_fm.constants import VERSION, FM_CACHE, RE_CACHE_TYPES, RE_FQDN, \
+    CHUNK_SIZE
+from csirtg_fm.clients.constants import FETCHER_TIMEOUT, NO_HEAD, TRACE, \
+    FETCHER_POOL_SIZE, FETCHER_KEEPALIVE
 
 from csirtg_fm.utils import get_modified, get_size, decode
+from csirtg_fm.utils.decoders import write_stream, strip_extension
+from csirtg_fm.utils.fetcher import RetryLater
 
 logging.getLogger('requests.packages.urllib3.connectionpool')\
     .setLevel(logging.WARNING)
@@ -21,6 +29,59 @@ if TRACE:
 
 logger = logging.getLogger(__name__)
 
+# one session (and connection pool) per scheme+host, shared by every feed
+# from that provider
+SESSIONS = {}
+SESSIONS_LOCK = threading.Lock()
+
+
+def get_session(remote, pool_size=FETCHER_POOL_SIZE,
+                keepalive=FETCHER_KEEPALIVE):
+    u = urlparse(remote)
+    key = (u.scheme, u.netloc)
+
+    with SESSIONS_LOCK:
+        if SESSIONS.get(key):
+            return SESSIONS[key]
+
+        s = requests.session()
+        s.headers['User-Agent'] = f"csirtg-fm/{VERSION} (csirtgadgets.com)"
+        s.headers['Accept'] = 'application/json'
+
+        if not keepalive:
+            s.headers['Connection'] = 'close'
+
+        adapter = HTTPAdapter(pool_maxsize=int(pool_size))
+        s.mount('http://', adapter)
+        s.mount('https://', adapter)
+
+        SESSIONS[key] = s
+        return s
+
+
+def get_retry_after(resp):
+    v = resp.headers.get('Retry-After')
+    if not v:
+        return
+
+    if v.isdigit():
+        return int(v)
+
+    try:
+        ts = parsedate_to_datetime(v)
+    except (TypeError, ValueError):
+        return
+
+    return max(0, (ts - datetime.now(timezone.utc)).total_seconds())
+
+
+def close_sessions():
+    with SESSIONS_LOCK:
+        for s in SESSIONS.values():
+            s.close()
+
+        SESSIONS.clear()
+
 
 class Client(object):
 
@@ -36,12 +97,6 @@ class Client(object):
         self.timeout = FETCHER_TIMEOUT
         self.verify_ssl = kwargs.get('verify_ssl', True)
 
-        self.handle = requests.session()
-        self.handle.headers['User-Agent'] = \
-            f"csirtg-fm/{VERSION} (csirtgadgets.com)"
-
-        self.handle.headers['Accept'] = 'application/json'
-
         if isinstance(self.rule, str):
             from csirtg_fm.utils.rules import load_rules
             self.rule, f, p = next(load_rules(self.rule, feed))
@@ -52,6 +107,9 @@ class Client(object):
         self.provider = self.rule.get('provider')
 
         self._init_remote(feed)
+        self.host = urlparse(self.remote).netloc
+        self.handle = get_session(self.remote)
+
         self._init_provider()
         self._init_paths(feed)
 
@@ -105,6 +163,8 @@ class Client(object):
     def _init_paths(self, feed):
         if os.path.isfile(self.remote):
             self.cache = self.remote
+            self.download = self.remote
+            self.meta = None
             return
 
         self.dir = os.path.join(self.cache, self.provider)
@@ -130,6 +190,10 @@ class Client(object):
         else:
             self.cache = os.path.join(self.dir, self.feed)
 
+        # the raw download, and its response validators for conditional GETs
+        self.download = self.cache
+        self.meta = '%s.meta' % self.cache
+
         # test to see if we've decompressed a similarly named text file
         logger.debug(self.cache)
         if self.cache.endswith('.zip'):
@@ -148,51 +212,96 @@ class Client(object):
             if os.path.exists(f):
                 self.cache = f
 
+        elif strip_extension(self.cache) != self.cache:
+            f = strip_extension(self.cache)
+            if os.path.exists(f):
+                self.cache = f
+
         logger.debug('CACHE %s' % self.cache)
 
-    def _cache_refresh(self, s):
+    def _meta_read(self):
+        if NO_HEAD or not self.meta or not os.path.exists(self.meta):
+            return {}
+
+        try:
+            with open(self.meta) as f:
+                meta = json.load(f)
+
+        except ValueError as e:
+            logger.debug(e)
+            return {}
+
+        if meta.get('remote') != self.remote:
+            return {}
+
+        return meta
+
+    def _meta_write(self, resp, digest):
+        meta = {
+            'remote': self.remote,
+            'etag': resp.headers.get('ETag'),
+            'last_modified': resp.headers.get('Last-Modified'),
+            'content_length': resp.headers.get('Content-Length'),
+            'sha256': digest,
+        }
+
+        with open(self.meta, 'w') as f:
+            json.dump(meta, f)
+
+    def _conditional_headers(self):
+        if get_size(self.cache) == 0:
+            return {}
+
+        meta = self._meta_read()
+        headers = {}
+
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+        return headers
+
+    def _cache_refresh(self, s, headers={}):
         resp = s.get(self.remote, stream=True, auth=self.auth,
-                     timeout=self.timeout, verify=self.verify_ssl)
+                     timeout=self.timeout, verify=self.verify_ssl,
+                     headers=headers)
 
-        if resp.status_code == 200:
+        if resp.status_code in [200, 304]:
             return resp
 
         if resp.status_code not in [429, 500, 502, 503, 504]:
             return
 
-        n = RETRIES
-        retry_delay = RETRIES_DELAY
-        while True:
-            if resp.status_code == 429:
-                logger.info('Rate Limit Exceeded'
-                            'retrying in %ss' % retry_delay)
-            else:
-                logger.error('%s found, retrying in %ss' %
-                             (resp.status_code, retry_delay))
-
-            sleep(retry_delay)
-            resp = s.get(self.remote, stream=True, auth=self.auth,
-                         timeout=self.timeout,
-                         verify=self.verify_ssl)
-
-            if resp.status_code == 200:
-                return resp
+        if resp.status_code == 429:
+            logger.info(f"Rate Limit Exceeded: {self.remote}")
+        else:
+            logger.error(f"{resp.status_code} found: {self.remote}")
 
-            n -= 1
-            if n == 0:
-                break
+        # the fetcher re-queues us, other feeds keep going in the meantime
+        raise RetryLater(resp.status_code, get_retry_after(resp))
 
     def _cache_write(self, s):
-        resp = self._cache_refresh(s)
+        resp = self._cache_refresh(s, headers=self._conditional_headers())
 
         if not resp:
             return
 
-        with open(self.cache, 'wb') as f:
-            for block in resp.iter_content(1024):
-                f.write(block)
+        if resp.status_code == 304:
+            logger.info(f"not modified: {self.remote}")
+
+            # reset the freshness window
+            os.utime(self.cache)
+            self.cache = decode(self.cache)
+            return
+
+        # decompress while streaming to disk, the write is atomic
+        digest = hashlib.sha256()
+        self.cache = write_stream(resp.iter_content(CHUNK_SIZE),
+                                  self.download, digest=digest)
 
-        self.cache = decode(self.cache)
+        self._meta_write(resp, digest.hexdigest())
 
     def _fetch(self, fetch):
         if get_size(self.cache) == 0:
@@ -215,32 +324,14 @@ class Client(object):
         if not self._fetch(fetch):
             return
 
+        # a single conditional GET, a 304 means the cache is current
         try:
-            resp = self.handle.head(self.remote, auth=self.auth,
-                                    verify=self.verify_ssl)
+            self._cache_write(self.handle)
+
+        except RetryLater:
+            raise
 
         except Exception as e:
             logger.error(f"connection error: {self.remote}")
             logger.debug(e)
-            return
-
-        if resp.status_code in [429, 500, 502, 503, 504]:
-            logger.info('HEAD check received: %s' % str(resp.status_code))
-            logger.info('skipping until next cycle..')
             self.cache = decode(self.cache)
-            return
-
-        if not resp.headers.get('Last-Modified'):
-            self._cache_write(self.handle)
-            return
-
-        ts = resp.headers.get('Last-Modified')
-
-        ts1 = arrow.get(datetime.strptime(ts, '%a, %d %b %Y %X %Z'))
-        ts2 = get_modified(self.cache)
-
-        if not NO_HEAD and (ts1 <= ts2):
-            self.cache = decode(self.cache)
-            return
-
-        self._cache_write(self.handle)
@@ -15,6 +15,15 @@ FM_CACHE = os.path.join(RUNTIME_PATH, 'fm')
 FM_CACHE = os.getenv('CSIRTG_FM_CACHE_PATH', FM_CACHE)
 CACHE_PATH = FM_CACHE
 
+# detected file types, keyed on path, size and mtime
+TYPES_CACHE = os.getenv('CSIRTG_FM_TYPES_CACHE',
+                        os.path.join(FM_CACHE, 'types.json'))
+TYPES_CACHE_SIZE = int(os.getenv('CSIRTG_FM_TYPES_CACHE_SIZE', 1000))
+
+# line fingerprints for incremental processing
+SNAPSHOT_PATH = os.getenv('CSIRTG_FM_SNAPSHOT_PATH',
+                          os.path.join(FM_CACHE, 'snapshots'))
+
 FM_RULES_PATH = os.getenv('CSIRTG_FM_RULES_PATH',
                           os.path.join(os.getcwd(), 'rules'))
 
@@ -22,6 +31,22 @@ FIREBALL_SIZE = os.getenv('CSIRTG_FM_FIREBALL_SIZE', 500)
 if FIREBALL_SIZE == '':
     FIREBALL_SIZE = 500
 
+# read/write block size for downloads and decompression
+CHUNK_SIZE = int(os.getenv('CSIRTG_FM_CHUNK_SIZE', 65536))
+
+# resolved itypes (and failures) kept in memory
+ITYPE_CACHE_SIZE = int(os.getenv('CSIRTG_FM_ITYPE_CACHE_SIZE', 65536))
+
+# parsed timestamps (and failures) kept in memory
+TIMESTAMP_CACHE_SIZE = int(os.getenv('CSIRTG_FM_TIMESTAMP_CACHE_SIZE', 65536))
+
+# feeds at least this big are split into byte ranges and parsed in parallel
+PARSER_SPLIT_SIZE = int(os.getenv('CSIRTG_FM_PARSER_SPLIT_SIZE', 67108864))
+PARSER_WORKERS = int(os.getenv('CSIRTG_FM_PARSER_WORKERS',
+                               os.cpu_count() or 1))
+
+# number of lines a column schema is learnt from before it's reused
+SCHEMA_SAMPLE = int(os.getenv('CSIRTG_FM_SCHEMA_SAMPLE', 25))
 
 LOGLEVEL = os.getenv('CSIRTG_FM_LOGLEVEL', 'ERROR')
 
@@ -1,10 +1,15 @@
+import json
 import magic
+import os
 import re
 import logging
+import threading
 from collections import defaultdict
 
-from csirtg_indicator.utils import resolve_itype
+from csirtg_fm.utils.itype import resolve_itype
+from csirtg_fm.utils.decoders import atomic_write
 
+from csirtg_fm.constants import TYPES_CACHE, TYPES_CACHE_SIZE, VERSION
 from .utils import is_ascii, is_delimited, is_flat, is_json, is_xml
 
 
@@ -20,7 +25,117 @@ FILE_TYPE_TESTS = [
 logger = logging.getLogger(__name__)
 
 
+class TypeCache(object):
+    """
+    Detected mimetype and parser per cache file, keyed on the file's
+    path, size and mtime so libmagic and the sniffing tests only run when
+    the file changes. Persisted as json between runs, save() writes it once
+    at the end of a run, dropping files that are gone and the oldest entries
+    past `size`.
+    """
+
+    def __init__(self, path=TYPES_CACHE, size=TYPES_CACHE_SIZE):
+        self.path = path
+        self.size = int(size)
+        self.lock = threading.Lock()
+        self.entries = None
+        self.dirty = False
+
+    def _load(self):
+        if self.entries is not None:
+            return
+
+        self.entries = {}
+        if not self.path or not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path) as f:
+                self.entries = json.load(f)
+
+        except ValueError as e:
+            logger.debug(e)
+
+    def _prune(self):
+        for fname in list(self.entries):
+            if not os.path.exists(fname):
+                del self.entries[fname]
+
+        # oldest first
+        for fname in list(self.entries)[:-self.size or None]:
+            del self.entries[fname]
+
+    def save(self):
+        if not self.path:
+            return
+
+        with self.lock:
+            if not self.dirty:
+                return
+
+            self._prune()
+
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+                with atomic_write(self.path, 'w') as f:
+                    json.dump(self.entries, f)
+
+            except OSError as err:
+                logger.debug(err)
+                return
+
+            self.dirty = False
+
+    @staticmethod
+    def _key(fname):
+        s = os.stat(fname)
+        return os.path.abspath(fname), [s.st_size, s.st_mtime_ns, VERSION]
+
+    def get(self, fname, field):
+        fname, stat = self._key(fname)
+
+        with self.lock:
+            self._load()
+            e = self.entries.get(fname)
+
+        if not e or e['stat'] != stat:
+            return False, None
+
+        if field not in e:
+            return False, None
+
+        return True, e[field]
+
+    def set(self, fname, field, value):
+        fname, stat = self._key(fname)
+
+        with self.lock:
+            self._load()
+
+            e = self.entries.pop(fname, None)
+            if not e or e['stat'] != stat:
+                e = {'stat': stat}
+
+            e[field] = value
+            self.entries[fname] = e
+            self.dirty = True
+
+
+types_cache = TypeCache()
+
+
 def get_mimetype(f):
+    found, ftype = types_cache.get(f, 'mime')
+    if found:
+        return ftype
+
+    ftype = _get_mimetype(f)
+    types_cache.set(f, 'mime', ftype)
+    return ftype
+
+
+def _get_mimetype(f):
     try:
         ftype = magic.from_file(f, mime=True)
         return ftype
@@ -37,24 +152,32 @@ def get_mimetype(f):
 
 
 def get_file_type(fname, mime=None):
+    found, t = types_cache.get(fname, 'type')
+    if found:
+        return t
+
+    t = _get_file_type(fname, mime)
+    types_cache.set(fname, 'type', t)
+    return t
+
+
+def _get_file_type(fname, mime=None):
     if not mime:
         mime = get_mimetype(fname)
 
-    if isinstance(fname, str):
-        f = open(fname, 'rb')
-
-    for tt in FILE_TYPE_TESTS:
-        f.seek(0)
+    with open(fname, 'rb') as f:
+        for tt in FILE_TYPE_TESTS:
+            f.seek(0)
 
-        try:
-            t = tt(f, mime)
+            try:
+                t = tt(f, mime)
 
-        except Exception as e:
-            logger.debug(e, exc_info=True)
-            continue
+            except Exception as e:
+                logger.debug(e, exc_info=True)
+                continue
 
-        if t:
-            return t
+            if t:
+                return t
 
     if fname.endswith('.csv') or fname.endswith('.xls'):
         return 'csv'
@@ -91,7 +214,8 @@ def peek(f, lines=5, delim=','):
     n = lines
     freq_dict = defaultdict(int)
 
-    for l in f.readlines():
+    # iterate, we only need the first few lines
+    for l in f:
         if l.startswith('#'):
             continue
 
@@ -1,10 +1,29 @@
 from collections import OrderedDict
 import logging
+import os
 
-from csirtg_indicator.utils import resolve_itype
+from csirtg_fm.utils.itype import resolve_itype
 
 logger = logging.getLogger(__name__)
 
+# sniffing reads at most this much from either end of a file
+HEAD_SIZE = 65536
+TAIL_SIZE = 4096
+
+
+def head(f, size=HEAD_SIZE):
+    # the next line, bounded for files with huge (or no) line breaks
+    return f.readline(size)
+
+
+def tail(f, size=TAIL_SIZE):
+    # the last line, from a bounded window at EOF
+    f.seek(0, os.SEEK_END)
+    end = f.tell()
+
+    f.seek(max(0, end - size))
+    return f.read(size).rstrip(b"\n").split(b"\n")[-1]
+
 
 def is_ascii(f, mime):
     if mime.startswith(('text/plain', 'ASCII text')):
@@ -16,7 +35,7 @@ def is_flat(f, mime):
         return
 
     n = 5
-    for l in f.readlines():
+    for l in iter(lambda: head(f), b''):
         if isinstance(l, bytes):
             l = l.decode('utf-8')
 
@@ -33,7 +52,7 @@ def is_flat(f, mime):
         if n == 0:
             break
 
-    return 'csv'
+    return 'flat'
 
 
 def is_xml(f, mime):
@@ -41,9 +60,9 @@ def is_xml(f, mime):
                             'text/xml')):
         return
 
-    first = f.readline()
-    second = f.readline().rstrip(b"\n")
-    last = f.readlines()[-1].rstrip(b"\n")
+    first = head(f)
+    second = head(f).rstrip(b"\n")
+    last = tail(f)
 
     if not first.startswith(b"<?xml "):
         return
@@ -61,13 +80,8 @@ def is_json(f, mime):
     if not is_ascii(f, mime):
         return
 
-    first = f.readline().rstrip(b"\n")
-    last = first
-
-    try:
-        last = f.readlines()[-1].rstrip(b"\n")
-    except Exception as e:
-        pass
+    first = head(f).rstrip(b"\n")
+    last = tail(f)
 
     if not first.startswith((b"'[{", b"'{")) and not \
             first.startswith((b"[{", b"{")):
@@ -91,15 +105,15 @@ def is_delimited(f, mime):
         (',', 'csv'),
     ])
 
-    first = f.readline().rstrip(b"\n")
+    first = head(f).rstrip(b"\n")
 
     while first.startswith(b'#'):
-        first = f.readline().rstrip(b"\n")
+        first = head(f).rstrip(b"\n")
 
     if isinstance(first, bytes):
         first = first.decode('utf-8')
 
-    second = f.readline().rstrip(b"\n")
+    second = head(f).rstrip(b"\n")
     if isinstance(second, bytes):
         second = second.decode('utf-8')
 
@@ -1,61 +1,186 @@
+import mmap
 import re
 import logging
 
+from csirtg_fm.utils import reverse_lines, contains
+from csirtg_fm.utils.record import Record
+from csirtg_fm.utils.rules import compile_rule
+from csirtg_fm.utils.validators import get_validator
+
 RE_COMMENTS = '^([#|;]+)'
 
+# constructs that could match across lines (or that behave differently on
+# bytes), regexes using them can't be run over a whole buffer
+RE_UNSAFE = re.compile(r'\\[sWDwbB]|\[\^|\(\?[a-zA-Z]*s')
+
 logger = logging.getLogger(__name__)
 
+
+def _decode(line, newline=None):
+    # text mode: crlf becomes \n, unless asked for the raw line endings
+    if newline is None and line.endswith(b'\r\n'):
+        line = line[:-2] + b'\n'
+
+    return line.decode('utf-8', 'ignore')
+
+
 fields = ['cache', 'rule', 'feed', 'skip_first', 'skip_invalid', 'skip',
-          'line_filter', 'limit']
+          'line_filter', 'limit', 'snapshot', 'start', 'end']
 
 
 class Parser(object):
     comments = re.compile(RE_COMMENTS)
     line_count = 0
+    prefiltered = False
+
+    # line based parsers can be handed a byte range of the cache
+    splittable = False
 
     def __init__(self, **kwargs):
 
         for f in fields:
             setattr(self, f, kwargs.get(f))
 
-        if not self.rule.get('defaults'):
-            self.rule['defaults'] = {}
+        # compiled once per feed (FM hands it over), never the raw rule
+        self.spec = kwargs.get('spec') or compile_rule(self.rule, self.feed)
 
-        if self.rule['defaults'].get('values') and isinstance(self.rule['defaults']['values'], str):
-            self.rule['defaults']['values'] = [self.rule['defaults']['values']]
+        if self.spec.skip:
+            self.skip = self.spec.skip
 
-        if self.rule['feeds'][self.feed].get('skip'):
-            self.skip = re.compile(self.rule['feeds'][self.feed]['skip'])
-        elif self.rule.get('skip'):
-            self.skip = re.compile(self.rule['skip'])
-
-        if self.rule['feeds'][self.feed].get('skip_first'):
-            self.skip_first = True
-        elif self.rule.get('skip_first'):
+        if self.spec.skip_first:
             self.skip_first = True
 
-        if self.rule['feeds'][self.feed].get('itype'):
-            self.itype = self.rule['feeds'][self.feed]['itype']
-        elif self.rule.get('itype'):
-            self.itype = self.rule['itype']
+        # only the first range has the first line
+        if self.start:
+            self.skip_first = False
 
-        if self.rule['feeds'][self.feed].get('line_filter'):
-            self.line_filter = self.rule['feeds'][self.feed]['line_filter']
-        elif self.rule.get('line_filter'):
-            self.line_filter = self.rule['line_filter']
+        # the rule's column -> field plan
+        self.columns = self.spec.columns
 
-        if self.line_filter:
-            self.line_filter = re.compile(self.line_filter)
+        self.itype = self.spec.itype
+
+        # a declared itype gets one check instead of auto-detection
+        self.validator = get_validator(self.itype)
+        self.rejected = 0
 
-        if self.rule['feeds'][self.feed].get('limit'):
-            self.limit = self.rule['feeds'][self.feed]['limit']
-        elif self.rule.get('limit'):
-            self.limit = self.rule['limit']
+        if self.spec.line_filter:
+            self.line_filter = self.spec.line_filter
+
+        if self.spec.limit:
+            self.limit = self.spec.limit
 
         if self.limit is not None:
             self.limit = int(self.limit)
 
+    def lines(self, mode='r', reverse=False, newline=None):
+        # lazily iterate over the cache, memory stays constant regardless
+        # of the size of the feed
+        self.prefiltered = False
+
+        if reverse:
+            with open(self.cache, 'rb') as cache:
+                for line in reverse_lines(cache):
+                    if mode != 'rb':
+                        line = _decode(line, newline)
+                    yield line
+            return
+
+        keep = None
+        if mode == 'r':
+            keep = self.prefilter()
+
+        # the bytes regex would see the \r of crlf lines (text mode doesn't),
+        # a `$` in skip or line_filter wouldn't match
+        if keep and contains(self.cache, b'\r'):
+            keep = None
+
+        if keep:
+            yield from self._prefiltered(keep)
+            return
+
+        if self.end is not None:
+            yield from self._range(mode, newline)
+            return
+
+        if mode == 'rb':
+            cache = open(self.cache, 'rb')
+        else:
+            cache = open(self.cache, 'r', encoding='utf-8', errors='ignore',
+                         newline=newline)
+
+        with cache:
+            yield from cache
+
+    def prefilter(self):
+        """
+        The comment, skip and line_filter conditions combined into a single
+        bytes regex matching the lines to keep, None if they can't be.
+        """
+        if self.skip_first:
+            return
+
+        p = [r'^(?![#|;])']
+
+        if self.skip:
+            if RE_UNSAFE.search(self.skip.pattern):
+                return
+
+            p.append(r'(?!.*(?:%s))' % self.skip.pattern)
+
+        if self.line_filter:
+            if RE_UNSAFE.search(self.line_filter.pattern):
+                return
+
+            p.append(r'(?=.*(?:%s))' % self.line_filter.pattern)
+
+        p.append(r'.+$')
+
+        try:
+            return re.compile(''.join(p).encode('utf-8'), re.MULTILINE)
+
+        except re.error:
+            return
+
+    def _prefiltered(self, keep):
+        # only the lines that survive the prefilter are decoded
+        with open(self.cache, 'rb') as f:
+            try:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty
+                return
+
+            with buf:
+                self.prefiltered = True
+                for m in keep.finditer(buf, *self.range(buf)):
+                    yield m.group(0).decode('utf-8', 'ignore') + "\n"
+
+    def range(self, buf):
+        # the (start, end) offsets to read
+        if self.end is None:
+            return 0, len(buf)
+
+        return self.start or 0, self.end
+
+    def _range(self, mode, newline=None):
+        with open(self.cache, 'rb') as f:
+            pos = self.start or 0
+            f.seek(pos)
+
+            for line in f:
+                if pos >= self.end:
+                    return
+
+                pos += len(line)
+                if mode != 'rb':
+                    line = _decode(line, newline)
+
+                yield line
+
     def ignore(self, line):
+        # comments, skip and line_filter were applied to the raw bytes
+        if self.prefiltered:
+            return False
+
         if line == '' or self.is_comment(line):
             return True
 
@@ -69,37 +194,83 @@ class Parser(object):
         if self.line_filter and not self.line_filter.search(line):
             return True
 
+    def is_unchanged(self, line):
+        # incremental mode, the line was in the feed's previous snapshot
+        if self.snapshot is None:
+            return False
+
+        return self.snapshot.seen(line)
+
     def is_comment(self, line):
         if self.comments.search(line):
             return True
 
-    def _defaults(self):
-        defaults = self.rule.get('defaults', {})
+    def check_itype(self, v):
+        """
+        Validate an indicator against the feed's declared itype, the ones
+        that pass keep it (Record.set_indicator) and are never resolved.
+        Rows that don't are counted as rejected.
+        """
+        if not self.validator:
+            return True
 
-        if not self.rule['feeds'][self.feed].get('defaults'):
-            return defaults
+        if self.validator(str(v).strip().lower()):
+            return True
 
-        for d in self.rule['feeds'][self.feed].get('defaults'):
-            if not d:
-                continue
+        self.rejected += 1
+        return False
 
-            defaults[d] = self.rule['feeds'][self.feed]['defaults'][d]
+    def indicator_column(self, m):
+        # where the indicator is, if the rule says so
+        for idx, k in self.columns:
+            if k == 'indicator':
+                return idx if idx < len(m) else None
 
-        return defaults
+        if len(m) == 1:
+            return 0
 
-    def set_defaults(self, i):
-        if not self.rule.get('defaults') and \
-                not self.rule['feeds'][self.feed].get('defaults'):
+    def declared(self, m):
+        """
+        With a declared itype and the indicator's column known the row
+        isn't classified, the record is built from the rule alone. None when
+        that doesn't apply, False when the indicator is rejected.
+        """
+        idx = self.indicator_column(m)
+        if idx is None or not self.validator:
             return
 
-        for k, v in self._defaults().items():
-            if isinstance(v, str) and ',' in v:
-                v = v.replace(' ', '')
-                v = v.split(',')
-            setattr(i, k, v)
+        v = m[idx].strip()
+        if not self.check_itype(v):
+            return False
+
+        i = Record()
+        self.set_indicator(i, v)
+        return i
+
+    def set_indicator(self, i, v):
+        # a declared itype (checked by check_itype) is kept, not resolved
+        i.set_indicator(str(v).strip(), self.itype if self.validator else None)
+
+    def set_defaults(self, i):
+        for k, v in self.spec.defaults:
+            if isinstance(v, tuple):
+                v = list(v)
+            i.set(k, v)
+
+        if self.spec.reference and not i.reference:
+            i.reference = self.spec.reference
 
-        if not i.reference or i.reference == '':
-            i.reference = self.rule['feeds'][self.feed].get('remote')
+    def set_values(self, i, m, skip_invalid=False):
+        for idx, k in self.columns:
+            try:
+                if k == 'indicator':
+                    self.set_indicator(i, m[idx])
+                else:
+                    i.set(k, m[idx])
+            except Exception:
+                if skip_invalid:
+                    continue
+                raise
 
     def process(self):
         raise NotImplementedError
@@ -3,7 +3,7 @@ from csirtg_fm.parsers.delim import Delim
 
 class Csv(Delim):
     delim = ","
-    strip = '"'
+    dialect = {'delimiter': ',', 'skipinitialspace': True}
 
     def __init__(self, **kwargs):
         super(Csv, self).__init__(**kwargs)
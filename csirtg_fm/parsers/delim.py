@@ -1,11 +1,13 @@
 
+import csv
 import re
 import logging
 import os
 
 from csirtg_fm.parsers import Parser
-from ..utils.columns import get_indicator
+from ..utils.columns import get_indicator, Schema
 from csirtg_fm.content import peek
+from csirtg_fm.utils import contains
 
 logger = logging.getLogger(__name__)
 TRACE = os.getenv('CSIRTG_FM_PARSER_TRACE', '1')
@@ -16,6 +18,10 @@ if logger.getEffectiveLevel() == logging.DEBUG:
 
 
 class Delim(Parser):
+    # csv.reader format parameters, without them lines are split on the
+    # `delim` regex
+    dialect = None
+    splittable = True
 
     def __init__(self, **kwargs):
         super(Delim, self).__init__(**kwargs)
@@ -23,55 +29,115 @@ class Delim(Parser):
         if self.delim and isinstance(self.delim, str):
             self.pattern = re.compile(self.delim)
 
-        self.reverse = False
-        if self.rule.get('reverse', '') == '1':
-            self.reverse = True
+        self.reverse = self.spec.reverse
 
-    def process(self, **kwargs):
-        count = 0
+    @property
+    def splittable(self):
+        # ranges are cut on newlines, a quoted field can span them
+        if not self.dialect:
+            return True
+
+        return not contains(self.cache, self.dialect.get('quotechar', '"'))
+
+    def prefilter(self):
+        # comments, skip and line_filter apply to whole rows, not lines
+        if self.dialect:
+            return
 
-        # TODO- rb
-        cache = open(self.cache, 'r', encoding='utf-8', errors='ignore')
+        return super(Delim, self).prefilter()
 
-        hints = peek(cache, lines=25, delim=self.delim)
-        cache.seek(0)
-        g = cache.readlines()
-        if self.reverse:
-            g = reversed(g)
+    def _lines(self):
+        # newest-at-the-bottom feeds are read backwards from EOF, with a
+        # limit only the tail of the file is touched
+        for line in self.lines(reverse=self.reverse):
+            if self.ignore(line):  # comment or skip
+                continue
 
-        for l in g:
-            if self.ignore(l):  # comment or skip
+            if self.is_unchanged(line):
                 continue
 
-            l = l.lstrip()
-            l = l.rstrip()
+            yield line.strip() + "\n"
 
-            logger.debug(l)
-            m = self.pattern.split(l)
+    def _records(self):
+        """
+        The physical lines go to csv.reader untouched, each row comes back
+        with the text it was read from.
+        """
+        text = []
 
-            if hasattr(self, 'strip'):
-                for idx, v in enumerate(m):
-                    m[idx] = v.strip(self.strip)
+        def _source():
+            for line in self.lines(reverse=self.reverse, newline=''):
+                text.append(line)
+                yield line
 
-            i = get_indicator(m, hints=hints)
+        reader = csv.reader(_source(), **self.dialect)
+        while True:
+            try:
+                row = next(reader)
 
-            if not i.itype:
-                logger.info("unable to detect indicator: \n%s" % l)
+            except StopIteration:
+                return
+
+            except csv.Error as e:
+                logger.error('csv parsing error: {}'.format(e))
+                text.clear()
                 continue
 
-            if self.rule['defaults'].get('values'):
-                for idx, v in enumerate(self.rule['defaults']['values']):
-                    if v:
-                        setattr(i, v, m[idx])
+            yield ''.join(text).rstrip("\r\n"), row
+            text.clear()
 
-            self.set_defaults(i)
+    def rows(self):
+        if not self.dialect:
+            for line in self._lines():
+                m = self.pattern.split(line.rstrip("\n"))
 
-            if self.rule['feeds'][self.feed].get('values'):
-                for idx, v in enumerate(self.rule['feeds'][self.feed]['values']):
-                    if v:
-                        setattr(i, v, m[idx])
+                if hasattr(self, 'strip'):
+                    for idx, v in enumerate(m):
+                        m[idx] = v.strip(self.strip)
 
-            yield i.__dict__()
+                yield m
+
+            return
+
+        # quoted (and multiline) fields are handled by the csv module,
+        # comments, skip and the snapshot are checked against the row
+        for text, m in self._records():
+            if self.ignore(text):
+                continue
+
+            if self.is_unchanged(text):
+                continue
+
+            yield m
+
+    def process(self, **kwargs):
+        count = 0
+        schema = Schema()
+
+        with open(self.cache, 'r', encoding='utf-8', errors='ignore') as f:
+            hints = peek(f, lines=25, delim=self.delim)
+
+        for m in self.rows():
+            if not m:
+                continue
+
+            logger.debug(m)
+
+            i = self.declared(m)
+            if i is False:
+                continue
+
+            if i is None:
+                i = get_indicator(m, hints=hints, schema=schema)
+
+            if not i.itype:
+                logger.info("unable to detect indicator: \n%s" % m)
+                continue
+
+            self.set_defaults(i)
+            self.set_values(i, m, kwargs.get('skip_invalid', False))
+
+            yield i
 
             logger.debug(i)
 
@@ -79,7 +145,5 @@ class Delim(Parser):
             if self.limit == count:
                 break
 
-            cache.close()
-
 
 Plugin = Delim
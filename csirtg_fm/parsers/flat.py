@@ -0,0 +1,84 @@
+import logging
+import os
+
+from csirtg_fm.parsers import Parser
+from csirtg_fm.utils.itype import resolve_itype
+from csirtg_fm.utils.record import Record
+
+logger = logging.getLogger(__name__)
+TRACE = os.getenv('CSIRTG_FM_PARSER_TRACE', '1')
+
+if logger.getEffectiveLevel() == logging.DEBUG:
+    if TRACE == '0':
+        logger.setLevel(logging.INFO)
+
+
+class Flat(Parser):
+    """
+    One indicator per line (blocklists, url dumps..). There's nothing to
+    classify, each line is stripped down to its first token and that token
+    is the indicator. Records are copied from a template holding the feed's
+    defaults.
+    """
+    splittable = True
+
+    def __init__(self, **kwargs):
+        super(Flat, self).__init__(**kwargs)
+
+        self.reverse = self.spec.reverse
+
+    def template(self):
+        r = Record()
+        self.set_defaults(r)
+        return r
+
+    def token(self, line):
+        try:
+            return line.split(None, 1)[0]
+
+        except IndexError:  # blank
+            return
+
+    def is_indicator(self, v):
+        if self.validator:
+            return self.check_itype(v)
+
+        try:
+            resolve_itype(v)
+
+        except TypeError:
+            self.rejected += 1
+            return False
+
+        return True
+
+    def process(self, **kwargs):
+        count = 0
+        template = self.template()
+
+        # newest-at-the-bottom feeds are read backwards from EOF
+        for line in self.lines(reverse=self.reverse):
+            if self.ignore(line):  # comment or skip
+                continue
+
+            if self.is_unchanged(line):
+                continue
+
+            v = self.token(line)
+            if not v or not self.is_indicator(v):
+                continue
+
+            i = template.copy()
+            self.set_values(i, [v], kwargs.get('skip_invalid', False))
+            self.set_indicator(i, v)
+
+            logger.debug(i)
+
+            yield i
+
+            count += 1
+            if self.limit == count:
+                break
+
+
+Plugin = Flat
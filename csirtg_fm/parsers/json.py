@@ -2,9 +2,10 @@ import json
 from csirtg_fm.parsers import Parser
 import logging
 import os
-from collections import OrderedDict
 
 from csirtg_fm.utils.columns import get_indicator
+from csirtg_fm.utils.jsonstream import iter_json
+from csirtg_fm.utils.record import Record
 
 logger = logging.getLogger(__name__)
 TRACE = os.getenv('CSIRTG_FM_PARSER_TRACE', '1')
@@ -19,26 +20,59 @@ class Json(Parser):
     def __init__(self, *args, **kwargs):
         super(Json, self).__init__(*args, **kwargs)
 
+    def records(self, envelope=None):
+        # one record at a time, the document is never decoded whole
+        with open(self.cache, 'r', encoding='utf-8', errors='ignore') as f:
+            try:
+                yield from iter_json(f, envelope=envelope)
+
+            except ValueError as e:
+                logger.error('json parsing error: {}'.format(e))
+
+    def _map(self, e, map, values):
+        i = Record()
+        self.set_defaults(i)
+
+        for c, v in zip(map, values):
+            if e.get(c) is None:
+                continue
+
+            if v == 'indicator':
+                if not self.check_itype(e[c]):
+                    return i
+
+                self.set_indicator(i, e[c])
+                continue
+
+            i.set(v, e[c])
+
+        return i
+
     def process(self, **kwargs):
         map = self.rule['feeds'][self.feed].get('map')
         values = self.rule['feeds'][self.feed].get('values')
         envelope = self.rule['feeds'][self.feed].get('envelope')
 
-        count = 0
-        cache = open(self.cache, 'rb')
-        for l in cache.readlines():
-            l = l.decode('utf-8')
+        # the rule says where the indicator is, skip the guesswork
+        direct = map and values and 'indicator' in values
 
-            try:
-                l = json.loads(l, object_pairs_hook=OrderedDict)  # py < 3.6
-            except ValueError as e:
-                logger.error('json parsing error: {}'.format(e))
+        count = 0
+        for e in self.records(envelope):
+            if self.snapshot is not None and \
+                    self.is_unchanged(json.dumps(e, sort_keys=True)):
                 continue
 
-            if envelope:
-                l = l[envelope]
+            if direct:
+                try:
+                    i = self._map(e, map, values)
+                except TypeError as err:
+                    logger.info(err)
+                    continue
 
-            for e in l:
+                if not i.indicator:
+                    continue
+
+            else:
                 m = [e[ii] for ii in e]
                 i = get_indicator(m)
                 self.set_defaults(i)
@@ -46,18 +80,16 @@ class Json(Parser):
                 if map:
                     for x, c in enumerate(map):
                         #i[values[x]] = e[c]
-                        setattr(i, values[x], e[c])
-
-                logger.debug(i)
+                        i.set(values[x], e[c])
 
-                yield i.__dict__()
+            logger.debug(i)
 
-                count += 1
+            yield i
 
-                if self.limit and int(self.limit) == count:
-                    break
+            count += 1
 
-        cache.close()
+            if self.limit and int(self.limit) == count:
+                break
 
 
 Plugin = Json
@@ -1,10 +1,11 @@
+import mmap
 import re
 import logging
 import os
 from pprint import pprint
 
-from csirtg_fm.parsers import Parser
-from csirtg_fm.utils.columns import get_indicator
+from csirtg_fm.parsers import Parser, RE_UNSAFE
+from csirtg_fm.utils.columns import get_indicator, Schema
 
 TRACE = os.getenv('CSIRTG_FM_PARSER_TRACE', '1')
 
@@ -17,43 +18,42 @@ if logger.getEffectiveLevel() == logging.DEBUG:
 
 
 class Pattern(Parser):
+    splittable = True
 
     def __init__(self, *args, **kwargs):
         super(Pattern, self).__init__(*args, **kwargs)
 
-        self.pattern = self.rule['defaults'].get('pattern', '^\S+$')
-
-        if self.rule['feeds'][self.feed].get('pattern'):
-            self.pattern = self.rule['feeds'][self.feed].get('pattern')
-
-        if self.pattern:
-            self.pattern = re.compile(self.pattern)
+        self.pattern = self.spec.pattern
+        self.columns = self.spec.pattern_columns
 
         self.split = "\n"
 
-        if self.rule['feeds'][self.feed].get('values'):
-            self.cols = self.rule['feeds'][self.feed].get('values')
-        else:
-            self.cols = self.rule['defaults'].get('values', [])
+    def _is_anchored(self):
+        p = self.pattern.pattern
+        if not p.startswith('^') or not p.endswith('$') or p.endswith('\\$'):
+            return False
 
-        self.defaults = self._defaults()
+        # constructs that could match across lines (or that differ between
+        # str and bytes patterns) need the per-line search
+        if RE_UNSAFE.search(p):
+            return False
 
-        if isinstance(self.cols, str):
-            self.cols = self.cols.split(',')
+        return not self.skip_first and self.snapshot is None
 
-    def process(self, **kwargs):
-        count = 0
-        cache = open(self.cache, 'r', encoding='utf-8', errors='ignore')
-        for l in cache.readlines():
-            if self.ignore(l):  # comment or skip
+    def _search(self):
+        for line in self.lines():
+            if self.ignore(line):  # comment or skip
+                continue
+
+            if self.is_unchanged(line):
                 continue
 
-            l = l.rstrip().replace('\"', '')
+            line = line.rstrip().replace('\"', '')
 
-            logger.debug(l)
+            logger.debug(line)
 
             try:
-                m = self.pattern.search(l).groups()
+                m = self.pattern.search(line).groups()
 
             except ValueError as e:
                 continue
@@ -61,40 +61,79 @@ class Pattern(Parser):
             except AttributeError as e:
                 continue
 
+            yield line, m
+
+    def _finditer(self):
+        """
+        Line-anchored patterns run over the whole (mmap'd) cache in one
+        finditer, only the matching lines make it back into python.
+        """
+        p = self.pattern.pattern[:-1] + r'[ \t\r]*$'
+        p = re.compile(p.encode('utf-8'), re.MULTILINE)
+
+        with open(self.cache, 'rb') as f:
+            try:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty
+                return
+
+            with buf:
+                start, end = self.range(buf)
+
+                # quotes are stripped from each line before it's searched
+                if buf.find(b'"', start, end) != -1:
+                    yield from self._search()
+                    return
+
+                for m in p.finditer(buf, start, end):
+                    line = m.group(0).decode('utf-8', 'ignore').rstrip()
+                    if self.ignore(line):
+                        continue
+
+                    groups = [g if g is None else g.decode('utf-8', 'ignore')
+                              for g in m.groups()]
+
+                    yield line, groups
+
+    def process(self, **kwargs):
+        count = 0
+        schema = Schema()
+
+        if self._is_anchored():
+            matches = self._finditer()
+        else:
+            matches = self._search()
+
+        for line, m in matches:
             # prob a single feed file
             if len(m) == 0:
-                m = [l]
+                m = [line]
             else:
                 m = list(m)
 
-            i = get_indicator(m)
+            i = self.declared(m)
+            if i is False:
+                continue
+
+            if i is None:
+                i = get_indicator(m, schema=schema)
 
             self.set_defaults(i)
-
-            if self.cols:
-                for idx, col in enumerate(self.cols):
-                    try:
-                        setattr(i, col, m[idx])
-                    except Exception as e:
-                        if kwargs.get('skip_invalid', False):
-                            continue
-                        raise
+            self.set_values(i, m, kwargs.get('skip_invalid', False))
 
             logger.debug(i)
 
             if not i.itype:
                 if TRACE == '1':
-                    logger.error("unable to parse line: \n%s" % l)
+                    logger.error("unable to parse line: \n%s" % line)
                 continue
 
-            yield i.__dict__()
+            yield i
 
             count += 1
 
             if self.limit and int(self.limit) == count:
                 break
 
-        cache.close()
-
 
 Plugin = Pattern
@@ -2,7 +2,8 @@ from csirtg_fm.parsers.delim import Delim
 
 
 class Pipe(Delim):
-    delim = r"\s{2,}|\s{2,}"
+    delim = "|"
+    dialect = {'delimiter': '|', 'skipinitialspace': True}
 
     def __init__(self, **kwargs):
         super(Pipe, self).__init__(**kwargs)
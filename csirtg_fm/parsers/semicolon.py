@@ -2,7 +2,8 @@ from csirtg_fm.parsers.delim import Delim
 
 
 class Semicolon(Delim):
-    delim = r"[\s+]?;[\s+]?"
+    delim = ";"
+    dialect = {'delimiter': ';', 'skipinitialspace': True}
 
     def __init__(self, **kwargs):
         super(Semicolon, self).__init__(**kwargs)
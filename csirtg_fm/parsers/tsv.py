@@ -2,6 +2,7 @@ from csirtg_fm.parsers.delim import Delim
 
 
 class Tsv(Delim):
+    dialect = {'delimiter': "\t"}
 
     def __init__(self, **kwargs):
         self.delim = "\t"
@@ -0,0 +1,193 @@
+import copy
+import html
+import itertools
+import json
+import re
+import logging
+import os
+from xml.etree import ElementTree
+
+import feedparser
+
+from csirtg_fm.constants import CHUNK_SIZE
+from csirtg_fm.parsers import Parser
+from csirtg_fm.utils.record import Record
+
+logger = logging.getLogger(__name__)
+TRACE = os.getenv('CSIRTG_FM_PARSER_TRACE', '1')
+
+if logger.getEffectiveLevel() == logging.DEBUG:
+    if TRACE == '0':
+        logger.setLevel(logging.INFO)
+
+# rss and atom elements holding a record
+RECORDS = ['item', 'entry']
+
+# map keys (feedparser names) and the elements they can be read from
+ALIASES = {
+    'summary': ['summary', 'description'],
+    'description': ['description', 'summary'],
+    'published': ['published', 'pubDate'],
+    'id': ['id', 'guid'],
+    'guid': ['guid', 'id'],
+    'content': ['content', 'encoded'],
+}
+
+
+def _local(tag):
+    # strip the {namespace}
+    return tag.rsplit('}', 1)[-1]
+
+
+class Xml(Parser):
+
+    def __init__(self, *args, **kwargs):
+        super(Xml, self).__init__(*args, **kwargs)
+
+        self.map = copy.deepcopy(self.rule['feeds'][self.feed]['map'])
+        for p in self.map:
+            self.map[p]['pattern'] = re.compile(self.map[p]['pattern'])
+
+        self.records = self.rule['feeds'][self.feed].get('element', RECORDS)
+        if isinstance(self.records, str):
+            self.records = [self.records]
+
+        # only the elements named in the map are read
+        self.fields = {}
+        for k in self.map:
+            for e in ALIASES.get(k, [k]):
+                self.fields.setdefault(e, k)
+
+    def _text(self):
+        # utf-8 like the other parsers, fed as text the parser ignores the
+        # encoding the document declares (feeds get that wrong)
+        with open(self.cache, 'r', encoding='utf-8', errors='ignore') as f:
+            yield from iter(lambda: f.read(CHUNK_SIZE), '')
+
+    def elements(self):
+        """
+        Yield the record elements as they're read, each one is cleared and
+        dropped from its parent once processed so memory stays flat.
+        """
+        parents = []
+        parser = ElementTree.XMLPullParser(('start', 'end'))
+
+        def _events():
+            for event, e in parser.read_events():
+                if event == 'start':
+                    parents.append(e)
+                    continue
+
+                parents.pop()
+                if _local(e.tag) not in self.records:
+                    continue
+
+                yield e
+
+                e.clear()
+                if parents:
+                    parents[-1].remove(e)
+
+        for block in self._text():
+            parser.feed(block)
+            yield from _events()
+
+        parser.close()
+        yield from _events()
+
+    def values(self, e):
+        rv = {}
+
+        for c in e:
+            k = self.fields.get(_local(c.tag))
+            if not k or k in rv:
+                continue
+
+            v = c.text
+            if not v or not v.strip():
+                v = c.get('href')  # atom links
+
+            if v:
+                rv[k] = v.strip()
+
+        return rv
+
+    def entries(self):
+        """
+        The values of each record. iterparse is strict, a malformed document
+        (a broken item, an html entity..) is handed to feedparser from the
+        record it stopped at.
+        """
+        n = 0
+        try:
+            for e in self.elements():
+                yield self.values(e)
+                n += 1
+
+        except ElementTree.ParseError as e:
+            logger.info('xml parsing error: {}, falling back to '
+                        'feedparser'.format(e))
+
+            yield from itertools.islice(self._feedparser(), n, None)
+
+    def _feedparser(self):
+        feed = feedparser.parse(''.join(self._text()))
+
+        # feedparser keeps the entities of html fields (&amp;), the element
+        # text they'd be read from otherwise doesn't
+        for e in feed.entries:
+            yield {k: html.unescape(e[k].strip()) for k in self.map
+                   if isinstance(e.get(k), str) and e[k].strip()}
+
+    def _map(self, i, values, itype=None):
+        for k, v in values.items():
+            try:
+                m = self.map[k]['pattern'].search(v).groups()
+            except AttributeError:
+                continue
+
+            for idx, c in enumerate(self.map[k]['values']):
+                s = m[idx]
+                if c == 'indicator' and itype == 'url' and \
+                        not m[idx].startswith('http'):
+                    s = 'http://%s' % s
+
+                if c == 'indicator':
+                    if not self.check_itype(s):
+                        return
+
+                    self.set_indicator(i, s)
+                    continue
+
+                i.set(c, s)
+
+    def process(self, **kwargs):
+        count = 0
+        for values in self.entries():
+            if self.snapshot is not None and \
+                    self.is_unchanged(json.dumps(values, sort_keys=True)):
+                continue
+
+            i = Record()
+            self.set_defaults(i)
+
+            try:
+                self._map(i, values, self.itype)
+            except TypeError as err:
+                logger.info(err)
+                continue
+
+            if not i.indicator:
+                continue
+
+            logger.debug(i)
+
+            yield i
+
+            count += 1
+
+            if self.limit and int(self.limit) == count:
+                return
+
+
+Plugin = Xml
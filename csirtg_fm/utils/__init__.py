@@ -3,13 +3,16 @@ from argparse import ArgumentParser
 import signal
 import os
 import importlib
+import mmap
+import hashlib
 from pprint import pprint
 import arrow
 
 from csirtgsdk.constants import LOG_FORMAT
-from csirtg_fm.constants import RUNTIME_PATH, VERSION, LOGLEVEL
+from csirtg_fm.constants import RUNTIME_PATH, VERSION, LOGLEVEL, CHUNK_SIZE
 from csirtg_fm.content import get_mimetype
-from .decoders import decompress_gzip, decompress_zip
+from .decoders import decompress_gzip, decompress_zip, decompress_bz2, \
+    decompress_xz
 
 
 def get_argument_parser():
@@ -108,12 +111,97 @@ def get_size(f):
     return s.st_size
 
 
+def get_digest(f, digest=None):
+    if not digest:
+        digest = hashlib.sha256()
+
+    with open(f, 'rb') as fh:
+        for block in iter(lambda: fh.read(CHUNK_SIZE), b''):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def reverse_lines(f, blocksize=CHUNK_SIZE):
+    """
+    Yield the lines of a binary file object from EOF toward the start,
+    reading it backwards a block at a time. Only the block being split (and
+    a line spanning blocks) is held in memory.
+    """
+    f.seek(0, os.SEEK_END)
+    pos = f.tell()
+    buf = b''
+
+    while pos > 0:
+        n = min(blocksize, pos)
+        pos -= n
+        f.seek(pos)
+        buf = f.read(n) + buf
+
+        # everything after the last newline (bar the line's own) is complete
+        end = len(buf)
+        i = buf.rfind(b'\n', 0, end - 1)
+        while i >= 0:
+            yield buf[i + 1:end]
+            end = i + 1
+            i = buf.rfind(b'\n', 0, end - 1)
+
+        buf = buf[:end]
+
+    if buf:
+        yield buf
+
+
+def get_ranges(f, size):
+    """
+    Split a file into (start, end) byte ranges of roughly `size` bytes, each
+    one ends on a newline.
+    """
+    total = get_size(f)
+
+    with open(f, 'rb') as fh:
+        start = 0
+        while start < total:
+            end = start + size
+            if end >= total:
+                yield start, total
+                return
+
+            fh.seek(end)
+            fh.readline()
+            end = fh.tell()
+
+            yield start, end
+            start = end
+
+
+def contains(f, s):
+    # is s anywhere in the file, without reading it into memory
+    if isinstance(s, str):
+        s = s.encode('utf-8')
+
+    with open(f, 'rb') as fh:
+        try:
+            buf = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty
+            return False
+
+        with buf:
+            return buf.find(s) != -1
+
+
 def decode(f):
     ftype = get_mimetype(f)
 
     if 'gzip' in ftype:
         return decompress_gzip(f)
 
+    if 'bzip2' in ftype:
+        return decompress_bz2(f)
+
+    if 'x-xz' in ftype:
+        return decompress_xz(f)
+
     if 'zip' in ftype:
         for fname in decompress_zip(f):
             return os.path.join(os.path.dirname(f), fname)
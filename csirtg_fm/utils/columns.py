@@ -1,19 +1,21 @@
-from csirtg_dt import get as get_ts
-from csirtg_indicator.utils import resolve_itype
-from csirtg_indicator import Indicator
+from csirtg_fm.utils.itype import resolve_itype
+from csirtg_fm.utils.record import Record
+from csirtg_fm.utils.timestamps import Timestamps, parse_timestamp
 import re
 
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict
+
+from csirtg_fm.constants import SCHEMA_SAMPLE
 
 
 def _calc_timestamps(i, timestamps):
     timestamps = sorted(timestamps, reverse=True)
 
     if len(timestamps) > 0:
-        i.last_at = timestamps[0]
+        i.set('last_at', timestamps[0])
 
     if len(timestamps) > 1:
-        i.first_at = timestamps[1]
+        i.set('first_at', timestamps[1])
 
 
 def _calc_ports(i, ports):
@@ -34,7 +36,7 @@ def _calc_ports(i, ports):
 
 
 def _get_indicator(i):
-    i2 = Indicator()
+    i2 = Record()
     timestamps = []
     ports = []
 
@@ -48,11 +50,12 @@ def _get_indicator(i):
             if i2.indicator:
                 i2.reference = e
             else:
-                i2.indicator = e
+                i2.set_indicator(e)
             continue
 
         if i[e] == 'timestamp':
-            timestamps.append(get_ts(e))
+            # already parsed (and cached) when the cell was classified
+            timestamps.append(parse_timestamp(e))
             continue
 
         if i[e] == 'float':
@@ -86,72 +89,160 @@ def _get_indicator(i):
     return i2
 
 
-def _get_elements(l, hints):
-    i = OrderedDict()
+def _is_timestamp(e, ts=None):
+    try:
+        if ts:
+            ts.parse(e)
+        else:
+            parse_timestamp(e)
+
+    except TypeError:
+        return False
+
+    return True
+
+
+def _classify(e, hints, ts=None):
+    if re.match('^[a-zA-Z]{2}$', e):
+        return 'CC'
+
+    t = None
+    try:
+        t = resolve_itype(e.rstrip('/'))
+        # 25553.0 ASN formats trip up FQDN resolve itype
+        if t and not (t == 'fqdn' and re.match(r'^\d+\.[0-9]$', e)):
+            return 'indicator'
+
+    except Exception:
+        pass
+
+    # integers
+    if isinstance(e, int):
+        return 'int'
+
+    # floats
+    if isinstance(e, float) or re.match(r'^\d+\.[0-9]$', e):
+        return 'float'
 
-    for e in l:
+    # timestamps
+    if _is_timestamp(e, ts):
+        return 'timestamp'
+
+    # basestrings
+    if isinstance(e, (str, bytes)):
+        if hints:
+            for ii in range(0, 25):
+                if len(hints) == ii:
+                    break
+
+                if e.lower() == hints[ii].lower():
+                    return 'description'
+
+        return 'string'
+
+
+def _get_roles(cells, hints, roles=None, timestamps=None):
+    rv = []
+
+    for idx, e in enumerate(cells):
         if not isinstance(e, (str, bytes)):
+            rv.append(None)
             continue
 
-        e = e.rstrip()
-        e = e.lstrip()
+        ts = None
+        if timestamps is not None:
+            ts = timestamps[idx]
 
-        if re.match('^[a-zA-Z]{2}$', e):
-            i[e] = 'CC'
+        # timestamp columns still have to parse, with the column's format
+        if roles and roles[idx] and \
+                (roles[idx] != 'timestamp' or _is_timestamp(e, ts)):
+            rv.append(roles[idx])
             continue
 
-        t = None
-        try:
-            t = resolve_itype(e.rstrip('/'))
-            # 25553.0 ASN formats trip up FQDN resolve itype
-            if t and not (t == 'fqdn' and re.match('^\d+\.[0-9]$', e)):
-                i[e] = 'indicator'
-                continue
+        rv.append(_classify(e.strip(), hints, ts))
 
-        except Exception:
-            pass
+    return rv
 
-        # integers
-        if isinstance(e, int):
-            i[e] = 'int'
-            continue
 
-        # floats
-        if isinstance(e, float) or re.match('^\d+\.[0-9]$', e):
-            i[e] = 'float'
-            continue
+def _get_elements(cells, hints, roles=None, timestamps=None):
+    i = OrderedDict()
 
-        # timestamps
-        try:
-            parse_timestamp(e)
-            i[e] = 'timestamp'
+    for e, r in zip(cells, _get_roles(cells, hints, roles, timestamps)):
+        if r is None:
             continue
-        except Exception:
-            pass
 
-        # basestrings
-        if isinstance(e, (str, bytes)):
-            if hints:
-                for ii in range(0, 25):
-                    if len(hints) == ii:
-                        break
+        i[e.strip()] = r
 
-                    if e.lower() == hints[ii].lower():
-                        i[e] = 'description'
-                        break
+    return i
 
-            if not i.get(e):
-                i[e] = 'string'
 
-    return i
+class Schema(object):
+    """
+    Column roles of a feed, learnt from its first `sample` lines.
+
+    Once learnt, columns that were classified the same way on every sampled
+    line are mapped by position, the rest are still classified cell by cell.
+    Lines of a different width (or that don't fit, eg: a bad indicator in
+    an indicator column) fall back to full classification. Each column
+    learns its own timestamp format.
+    """
+
+    def __init__(self, sample=SCHEMA_SAMPLE):
+        self.sample = int(sample)
+        self.seen = 0
+        self.columns = None
+        self.roles = None
+        self.timestamps = defaultdict(Timestamps)
+
+    def get(self, cells):
+        if self.roles and len(cells) == len(self.roles):
+            return self.roles
+
+    def learn(self, roles):
+        if self.roles:
+            return
+
+        if self.columns is None:
+            self.columns = [set() for _ in roles]
 
+        if len(roles) != len(self.columns):
+            return
 
-def get_indicator(l, hints=None):
+        for c, r in zip(self.columns, roles):
+            c.add(r)
+
+        self.seen += 1
+        if self.seen < self.sample:
+            return
+
+        self.roles = [c.pop() if len(c) == 1 else None for c in self.columns]
+        self.columns = None
+
+
+def get_indicator(l, hints=None, schema=None):
     if not isinstance(l, list):
         l = [l]
 
     l[-1] = l[-1].rstrip("\n")
-    i = _get_elements(l, hints)
+
+    timestamps = None
+    if schema is not None:
+        timestamps = schema.timestamps
+
+    if schema is not None and schema.get(l):
+        try:
+            return _get_indicator(_get_elements(l, hints, schema.get(l),
+                                                timestamps))
+
+        except TypeError:
+            # doesn't fit the schema
+            pass
+
+    roles = _get_roles(l, hints, timestamps=timestamps)
+    if schema is not None:
+        schema.learn(roles)
+
+    i = _get_elements(l, hints, roles)
     i2 = _get_indicator(i)
 
     return i2
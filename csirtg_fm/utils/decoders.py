@@ -1,39 +1,219 @@
+import bz2
 import gzip
+import lzma
 import os.path
+import shutil
+import tempfile
+import zlib
+from contextlib import contextmanager
 from zipfile import ZipFile
 
+from csirtg_fm.constants import CHUNK_SIZE
+
+# magic bytes, longest first
+MAGIC = [
+    (b'\xfd7zXZ\x00', 'xz'),
+    (b'PK\x03\x04', 'zip'),
+    (b'BZh', 'bz2'),
+    (b'\x1f\x8b', 'gzip'),
+]
+
+EXTENSIONS = {
+    'gzip': '.gz',
+    'bz2': '.bz2',
+    'xz': '.xz',
+    'zip': '.zip',
+}
+
+
+def get_compression(head):
+    # only the magic bytes, the Content-Type can say gzip for a body requests
+    # already decoded (Content-Encoding: gzip)
+    for m, c in MAGIC:
+        if head.startswith(m):
+            return c
+
+
+def _decompressor(compression):
+    if compression == 'gzip':
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    if compression == 'bz2':
+        return bz2.BZ2Decompressor()
+
+    if compression == 'xz':
+        return lzma.LZMADecompressor()
+
+
+class Decompressor(object):
+    """
+    Streaming decompression of concatenated members (multi-member gzip and
+    bz2, multi-stream xz), a new decompressor picks up where the last one
+    hit the end of its stream.
+    """
+
+    def __init__(self, compression):
+        self.compression = compression
+        self.d = _decompressor(compression)
+
+    def decompress(self, block):
+        rv = b''
+
+        while block:
+            if self.d.eof:
+                rv += self.flush()
+                self.d = _decompressor(self.compression)
+
+            rv += self.d.decompress(block)
+            block = self.d.unused_data if self.d.eof else b''
+
+        return rv
+
+    def flush(self):
+        if self.compression == 'gzip':
+            return self.d.flush()
+
+        return b''
+
+
+def strip_extension(path, compression=None):
+    for c, ext in EXTENSIONS.items():
+        if compression and c != compression:
+            continue
+
+        if path.endswith(ext):
+            return path[:-len(ext)]
+
+    return path
+
+
+def _umask():
+    u = os.umask(0)
+    os.umask(u)
+    return u
+
+
+# temp files are created 0600, the renamed file follows the umask instead
+MODE = 0o666 & ~_umask()
+
+
+@contextmanager
+def atomic_write(path, mode='wb'):
+    """
+    Write to a temp file next to `path`, renamed into place once the block
+    completes. On error the temp file is removed and `path` is untouched.
+    """
+    d, f = os.path.split(path)
+    tmp = tempfile.NamedTemporaryFile(mode, dir=d or '.', prefix=f".{f}.",
+                                      delete=False)
+
+    try:
+        with tmp:
+            yield tmp
+
+        os.chmod(tmp.name, MODE)
+        os.replace(tmp.name, path)
+
+    except BaseException:
+        try:
+            os.unlink(tmp.name)
+        except OSError:
+            pass
+
+        raise
+
+
+def _atomic_copy(src, path):
+    with atomic_write(path) as f:
+        shutil.copyfileobj(src, f, CHUNK_SIZE)
+
+    return path
+
+
+def write_stream(blocks, path, digest=None):
+    """
+    Write an iterable of downloaded blocks to disk, decompressing gzip, bz2
+    and xz on the fly. Zip archives are written as-is and their members
+    extracted next to them. The output is written to a temp file and renamed
+    into place, the path of the (decoded) file is returned.
+
+    :param blocks: iterable of bytes
+    :param path: path of the raw download
+    :param digest: optional hashlib object, updated with the raw blocks
+    :return: path of the decoded file
+    """
+    blocks = iter(blocks)
+
+    head = b''
+    for block in blocks:
+        head += block
+        if len(head) >= 6:
+            break
+
+    compression = get_compression(head)
+
+    d = None
+    if compression in ('gzip', 'bz2', 'xz'):
+        d = Decompressor(compression)
+
+    dest = path
+    if d:
+        dest = strip_extension(path, compression)
+
+    with atomic_write(dest) as f:
+        for block in _chain(head, blocks):
+            if digest:
+                digest.update(block)
+
+            if d:
+                block = d.decompress(block)
+
+            f.write(block)
+
+        if d:
+            f.write(d.flush())
+
+    if compression == 'zip':
+        for fname in decompress_zip(dest):
+            return fname
+
+    return dest
+
+
+def _chain(head, blocks):
+    if head:
+        yield head
+
+    yield from blocks
+
 
 def decompress_gzip(f):
+    # remove the '.gz' from the filename
+    path_to_store = strip_extension(f, 'gzip')
+
     with gzip.open(f, 'rb') as in_file:
-        s = in_file.read()
+        return _atomic_copy(in_file, path_to_store)
 
-    # Now store the uncompressed data
-    path_to_store = f[:-3]  # remove the '.gz' from the filename
 
-    try:
-        os.remove(path_to_store)
-    except:
-        pass
+def decompress_bz2(f):
+    with bz2.open(f, 'rb') as in_file:
+        return _atomic_copy(in_file, strip_extension(f, 'bz2'))
 
-    # store uncompressed file data from 's' variable
-    with open(path_to_store, 'wb') as f:
-        f.write(s)
 
-    return path_to_store
+def decompress_xz(f):
+    with lzma.open(f, 'rb') as in_file:
+        return _atomic_copy(in_file, strip_extension(f, 'xz'))
 
 
 def decompress_zip(zipfile):
     with ZipFile(zipfile) as f:
         for m in f.infolist():
+            if m.is_dir():
+                continue
+
             fname = os.path.join(os.path.dirname(zipfile), m.filename)
-            try:
-                os.remove(fname)
-            except:
-                pass
 
             with f.open(m.filename) as zip:
-                # store uncompressed file data from 's' variable
-                with open(fname, 'wb') as f:
-                    f.write(zip.read())
+                _atomic_copy(zip, fname)
 
             yield fname
@@ -0,0 +1,219 @@
+import logging
+import queue
+import random
+import threading
+import time
+from collections import defaultdict
+
+from csirtg_fm.clients.constants import FETCHER_WORKERS, FETCHER_HOST_LIMIT, \
+    FETCHER_HOST_RATE, FETCHER_HOST_BURST, RETRIES, RETRIES_DELAY, \
+    RETRIES_MAX_DELAY
+
+logger = logging.getLogger(__name__)
+
+
+class RetryLater(Exception):
+    """
+    Raised by a client when a fetch should be retried later (429, 5xx),
+    retry_after is the delay the remote asked for (Retry-After), if any.
+    """
+
+    def __init__(self, status, retry_after=None):
+        super(RetryLater, self).__init__(f"{status} received")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class TokenBucket(object):
+
+    def __init__(self, rate=FETCHER_HOST_RATE, burst=FETCHER_HOST_BURST):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def consume(self, now=None):
+        """
+        Take a token, returns 0 on success or the number of seconds until
+        the next token is available.
+        """
+        if self.rate <= 0:
+            return 0
+
+        if now is None:
+            now = time.monotonic()
+
+        self.tokens = min(self.burst,
+                          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+
+        return (1 - self.tokens) / self.rate
+
+
+class Job(object):
+
+    def __init__(self, cli, seq):
+        self.cli = cli
+        self.host = cli.host
+        self.cache = cli.cache
+        self.seq = seq
+        self.attempt = 0
+        self.ready_at = 0
+
+
+def backoff(attempt, delay=RETRIES_DELAY, max_delay=RETRIES_MAX_DELAY):
+    # exponential backoff with jitter
+    d = min(float(max_delay), float(delay) * (2 ** attempt))
+    return d / 2 + random.uniform(0, d / 2)
+
+
+class Fetcher(object):
+    """
+    Fetch a set of http clients concurrently through a bounded pool of
+    worker threads.
+
+    Jobs are handed out by a scheduler: at most `host_limit` fetches run
+    against any one host at a time, each host is rate limited by a token
+    bucket, and clients that share a cache file are serialized so the second
+    one finds a fresh cache instead of re-downloading it. A client raising
+    RetryLater is re-queued with exponential backoff (or its Retry-After)
+    while the other feeds keep making progress.
+    """
+
+    def __init__(self, workers=FETCHER_WORKERS, host_limit=FETCHER_HOST_LIMIT,
+                 retries=RETRIES, rate=FETCHER_HOST_RATE,
+                 burst=FETCHER_HOST_BURST, max_delay=RETRIES_MAX_DELAY):
+        self.workers = int(workers)
+        self.host_limit = int(host_limit)
+        self.retries = int(retries)
+        self.max_delay = float(max_delay)
+
+        self._cond = threading.Condition()
+        self._buckets = defaultdict(lambda: TokenBucket(rate, burst))
+        self._hosts = defaultdict(int)
+        self._caches = set()
+        self._pending = []
+        self._running = 0
+
+    def _next(self):
+        with self._cond:
+            while self._pending or self._running:
+                now = time.monotonic()
+                wait = None
+
+                for job in sorted(self._pending,
+                                  key=lambda j: (j.ready_at, j.seq)):
+                    if job.ready_at > now:
+                        wait = _min(wait, job.ready_at - now)
+                        break
+
+                    # woken up when a running job finishes
+                    if self._hosts[job.host] >= self.host_limit or \
+                            job.cache in self._caches:
+                        continue
+
+                    delay = self._buckets[job.host].consume(now)
+                    if delay:
+                        wait = _min(wait, delay)
+                        continue
+
+                    self._pending.remove(job)
+                    self._hosts[job.host] += 1
+                    self._caches.add(job.cache)
+                    self._running += 1
+                    return job
+
+                self._cond.wait(wait)
+
+    def _finish(self, job, retry=False):
+        with self._cond:
+            self._hosts[job.host] -= 1
+            self._caches.discard(job.cache)
+            self._running -= 1
+
+            if retry:
+                self._pending.append(job)
+
+            self._cond.notify_all()
+
+    def _retry(self, job, e):
+        if job.attempt >= self.retries:
+            return False
+
+        delay = e.retry_after
+        if delay is None:
+            delay = backoff(job.attempt, max_delay=self.max_delay)
+
+        # don't hold up the whole run, try again next cycle
+        if delay > self.max_delay:
+            logger.info(f"{e}: {job.cli.remote}, asked to retry in "
+                        f"{delay:.0f}s, skipping until the next run")
+            return False
+
+        job.attempt += 1
+        job.ready_at = time.monotonic() + delay
+
+        logger.info(f"{e}: {job.cli.remote}, retrying in {delay:.0f}s "
+                    f"({job.attempt}/{self.retries})")
+        return True
+
+    def _worker(self, done, fetch):
+        while True:
+            job = self._next()
+            if job is None:
+                return
+
+            err = None
+            try:
+                logger.info(f"fetching: {job.cli.remote}")
+                job.cli.fetch(fetch=fetch)
+
+            except RetryLater as e:
+                if self._retry(job, e):
+                    self._finish(job, retry=True)
+                    continue
+
+                err = e
+
+            except Exception as e:
+                err = e
+
+            self._finish(job)
+            done.put((job.cli, err))
+
+    def fetch(self, clients, fetch=True):
+        """
+        Fetch the given clients, yielding (client, error) tuples in the
+        order the fetches complete so parsing can start on the first feed
+        while the rest are still downloading.
+        """
+        if not clients:
+            return
+
+        done = queue.Queue()
+        with self._cond:
+            self._pending.extend(Job(cli, n) for n, cli in enumerate(clients))
+
+        threads = []
+        for _ in range(min(self.workers, len(clients))):
+            t = threading.Thread(target=self._worker, args=(done, fetch),
+                                 daemon=True)
+            t.start()
+            threads.append(t)
+
+        for _ in clients:
+            yield done.get()
+
+        for t in threads:
+            t.join()
+
+
+def _min(a, b):
+    if a is None:
+        return b
+
+    return min(a, b)
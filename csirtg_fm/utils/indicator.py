@@ -1,8 +1,31 @@
-from csirtg_indicator import Indicator
+from urllib.parse import urlparse
+
+from csirtg_indicator.utils import ipv4_normalize
+
+from csirtg_fm.utils.itype import resolve_itype
+
+
+def normalize_indicator(v, itype=None):
+    """
+    The indicator and its itype, normalized the way Indicator's setter does
+    (lowercase, url, ipv4 padding). The itype is resolved unless it's given.
+    """
+    v = v.lower()
+    if itype is None:
+        itype = resolve_itype(v)
+
+    if itype == 'url':
+        v = urlparse(v).geturl().rstrip('/').lower()
+
+    if itype == 'ipv4':
+        v = ipv4_normalize(v)
+
+    return v, itype
 
 
 def format_keys(i):
-    d = i.__dict__()
+    # expand '{provider}' style references to other fields, in place
+    d = i.fields()
     for k in d:
         if not isinstance(d[k], str):
             continue
@@ -11,8 +34,8 @@ def format_keys(i):
             continue
 
         try:
-            d[k] = d[k].format(**d)
+            setattr(i, k, d[k].format(**d))
         except (KeyError, ValueError, IndexError):
             pass
 
-    return Indicator(**d)
+    return i
@@ -0,0 +1,73 @@
+import logging
+import threading
+from collections import OrderedDict
+
+from csirtg_indicator.utils import resolve_itype as _resolve_itype
+
+from csirtg_fm.constants import ITYPE_CACHE_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class ItypeCache(object):
+    """
+    Bounded LRU of resolve_itype results. Feeds repeat the same values over
+    and over (and every cell gets tested), so failures are cached too and
+    re-raised as a TypeError.
+    """
+
+    def __init__(self, size=ITYPE_CACHE_SIZE):
+        self.size = int(size)
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def resolve(self, indicator, test_broken=False):
+        try:
+            key = (indicator, test_broken)
+            hash(key)
+        except TypeError:
+            return _resolve_itype(indicator, test_broken=test_broken)
+
+        with self._lock:
+            t = self._cache.get(key)
+            if t is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+
+        if t is None:
+            try:
+                t = _resolve_itype(indicator, test_broken=test_broken)
+            except TypeError as e:
+                t = e
+
+            with self._lock:
+                self.misses += 1
+                self._cache[key] = t
+                if len(self._cache) > self.size:
+                    self._cache.popitem(last=False)
+
+        if isinstance(t, TypeError):
+            raise TypeError(*t.args)
+
+        return t
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'size': len(self._cache)}
+
+
+itype_cache = ItypeCache()
+
+
+def resolve_itype(indicator, test_broken=False):
+    # csirtg_fm's own lookups (classification, records, validation), the
+    # Indicator built on output still resolves its itype once on its own
+    return itype_cache.resolve(indicator, test_broken=test_broken)
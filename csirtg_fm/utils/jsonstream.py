@@ -0,0 +1,142 @@
+import json
+from collections import OrderedDict
+
+from csirtg_fm.constants import CHUNK_SIZE
+
+WHITESPACE = ' \t\n\r'
+
+
+class JsonStream(object):
+    """
+    Decode a JSON document (or a stream of them, eg: NDJSON) from a text file
+    one value at a time, reading it in blocks.
+
+    Arrays are never decoded whole: at the top level, or below the
+    `envelope` key of a top level object, their elements are decoded and
+    yielded one by one.
+    """
+
+    def __init__(self, f, envelope=None, blocksize=CHUNK_SIZE):
+        self.f = f
+        self.envelope = envelope
+        self.blocksize = blocksize
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder(object_pairs_hook=OrderedDict)
+
+    def _fill(self):
+        if self.eof:
+            return False
+
+        data = self.f.read(self.blocksize)
+        if not data:
+            self.eof = True
+            return False
+
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def _peek(self):
+        while True:
+            n = len(self.buf)
+            while self.pos < n and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+
+            if self.pos < n:
+                return self.buf[self.pos]
+
+            if not self._fill():
+                return ''
+
+    def _value(self):
+        self._peek()
+
+        while True:
+            try:
+                v, end = self.decoder.raw_decode(self.buf, self.pos)
+
+                # a number at the end of the buffer might be cut short
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return v
+
+            except ValueError:
+                if self.eof:
+                    raise
+
+            self._fill()
+
+    def _array(self):
+        self.pos += 1  # [
+
+        while True:
+            c = self._peek()
+            if c == ']':
+                self.pos += 1
+                return
+
+            if c == ',':
+                self.pos += 1
+                continue
+
+            if not c:
+                raise ValueError('unexpected end of array')
+
+            yield self._value()
+
+    def _object(self):
+        self.pos += 1  # {
+
+        while True:
+            c = self._peek()
+            if c == '}':
+                self.pos += 1
+                return
+
+            if c == ',':
+                self.pos += 1
+                continue
+
+            if not c:
+                raise ValueError('unexpected end of object')
+
+            k = self._value()
+            if self._peek() != ':':
+                raise ValueError(f"expecting ':' after {k}")
+
+            self.pos += 1
+
+            if k != self.envelope:
+                self._value()
+                continue
+
+            if self._peek() == '[':
+                yield from self._array()
+                continue
+
+            v = self._value()
+            if isinstance(v, list):
+                yield from v
+            else:
+                yield v
+
+    def __iter__(self):
+        while True:
+            c = self._peek()
+            if not c:
+                return
+
+            if c == '[':
+                yield from self._array()
+
+            elif c == '{' and self.envelope:
+                yield from self._object()
+
+            else:
+                yield self._value()
+
+
+def iter_json(f, envelope=None, blocksize=CHUNK_SIZE):
+    return iter(JsonStream(f, envelope=envelope, blocksize=blocksize))
@@ -0,0 +1,81 @@
+from csirtg_indicator import Indicator
+from csirtg_indicator.constants import FIELDS, FIELDS_TIME
+
+from csirtg_fm.utils.indicator import normalize_indicator
+from csirtg_fm.utils.timestamps import parse_timestamp
+
+LISTS = ['tags', 'peers', 'upstream', 'downstream']
+
+
+class Record(object):
+    """
+    What a parser yields: the fields of an indicator in plain slots, filled
+    from classification and the rule's columns. It's carried through
+    validation, archiving and batching as-is, an Indicator is only built
+    from it (to_indicator) at the output boundary.
+    """
+
+    __slots__ = tuple(dict.fromkeys(FIELDS))
+
+    def __init__(self, **kwargs):
+        for k in self.__slots__:
+            setattr(self, k, None)
+
+        for k, v in kwargs.items():
+            if k == 'itype':
+                continue
+
+            if isinstance(v, str) and k in LISTS:
+                v = v.split(',')
+
+            self.set(k, v)
+
+        if not self.group:
+            self.group = 'everyone'
+
+    def set(self, k, v):
+        """
+        Set a field the way Indicator's setters would take it, the
+        indicator is normalized (and its itype resolved), timestamps become
+        datetimes. Anything that isn't an indicator field is dropped.
+        """
+        if k == 'indicator':
+            return self.set_indicator(v)
+
+        if k in FIELDS_TIME and v:
+            if isinstance(v, str):
+                v = parse_timestamp(v)
+
+            if hasattr(v, 'to'):  # arrow
+                v = v.to('utc').datetime
+
+        if k in self.__slots__:
+            setattr(self, k, v)
+
+    def set_indicator(self, v, itype=None):
+        # itype, when it's already known (eg: checked against the rule's)
+        if not v:
+            self.indicator = self.itype = None
+            return
+
+        self.indicator, self.itype = normalize_indicator(v, itype)
+
+    def copy(self):
+        r = self.__class__.__new__(self.__class__)
+        for k in self.__slots__:
+            v = getattr(self, k)
+            if isinstance(v, list):
+                v = list(v)
+            setattr(r, k, v)
+
+        return r
+
+    def fields(self):
+        return {k: getattr(self, k) for k in self.__slots__
+                if getattr(self, k) is not None}
+
+    def to_indicator(self):
+        return Indicator(**self.fields())
+
+    def __repr__(self):
+        return 'Record(%r)' % self.fields()
@@ -1,7 +1,11 @@
 
 import os
+import re
 import yaml
 import logging
+from collections import namedtuple
+
+from csirtg_indicator.constants import FIELDS
 
 logger = logging.getLogger(__name__)
 
@@ -57,3 +61,98 @@ def load_rules(rule, feed=None):
 
     else:
         yield from _load_rules(rule, feed)
+
+
+# what the parsers need from a rule/feed, worked out once per feed
+Spec = namedtuple('Spec', ['feed', 'parser', 'defaults', 'reference',
+                           'columns', 'pattern_columns', 'pattern', 'skip',
+                           'skip_first', 'line_filter', 'itype', 'limit',
+                           'reverse'])
+
+PATTERN = r'^\S+$'
+
+
+def _split(v):
+    if isinstance(v, str):
+        v = v.replace(' ', '').split(',')
+
+    return tuple(v or [])
+
+
+def _compile(p):
+    if p:
+        return re.compile(p)
+
+
+def compile_rule(rule, feed):
+    """
+    Compile a feed (and the rule it belongs to) into an immutable Spec. The
+    rule dict isn't touched, feeds sharing a rule don't see each other's
+    defaults.
+
+    :param rule: dict
+    :param feed: str
+    :return: Spec
+    """
+    f = rule['feeds'][feed]
+
+    rule_defaults = rule.get('defaults') or {}
+    feed_defaults = f.get('defaults') or {}
+
+    defaults = {}
+    for d in (rule_defaults, feed_defaults):
+        for k, v in d.items():
+            if not k or k not in FIELDS:
+                continue
+
+            if isinstance(v, str) and ',' in v:
+                v = _split(v)
+
+            elif isinstance(v, list):
+                v = tuple(v)
+
+            defaults[k] = v
+
+    # column -> field, the feed's values override the rule's and the rule's
+    # don't override the defaults
+    columns = {}
+    for idx, k in enumerate(_split(rule_defaults.get('values'))):
+        if k and k not in defaults:
+            columns[k] = idx
+
+    for idx, k in enumerate(_split(f.get('values'))):
+        if k:
+            columns[k] = idx
+
+    # Pattern only reads the feed's values (the rule's if it has none), all
+    # of them override the defaults
+    pattern_columns = {}
+    for idx, k in enumerate(_split(f.get('values')
+                                   or rule_defaults.get('values'))):
+        if k:
+            pattern_columns[k] = idx
+
+    reference = None
+    if rule_defaults or feed_defaults:
+        reference = f.get('remote')
+
+    limit = f.get('limit') or rule.get('limit')
+    if limit is not None:
+        limit = int(limit)
+
+    return Spec(
+        feed=feed,
+        parser=f.get('parser') or rule.get('parser'),
+        defaults=tuple(defaults.items()),
+        reference=reference,
+        columns=tuple((idx, k) for k, idx in columns.items()),
+        pattern_columns=tuple((idx, k) for k, idx in pattern_columns.items()),
+        pattern=_compile(f.get('pattern') or rule_defaults.get('pattern')
+                         or PATTERN),
+        skip=_compile(f.get('skip') or rule.get('skip')),
+        skip_first=bool(f.get('skip_first') or rule.get('skip_first')),
+        line_filter=_compile(f.get('line_filter') or rule.get('line_filter')),
+        itype=f.get('itype') or rule.get('itype'),
+        limit=limit,
+        reverse=str(f.get('reverse', rule.get('reverse'))) == '1',
+    )
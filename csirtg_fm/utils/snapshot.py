@@ -0,0 +1,71 @@
+import hashlib
+import logging
+import os
+from array import array
+from bisect import bisect_left
+
+from csirtg_fm.constants import SNAPSHOT_PATH
+from csirtg_fm.utils.decoders import atomic_write
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(line):
+    if isinstance(line, str):
+        line = line.encode('utf-8', 'ignore')
+
+    return int.from_bytes(hashlib.blake2b(line, digest_size=8).digest(),
+                          'little')
+
+
+class Snapshot(object):
+    """
+    64-bit fingerprints of the lines (or records) seen in the previous
+    snapshot of a feed, stored as a sorted, packed array of unsigned longs
+    and kept that way in memory (8 bytes a line), lookups are a binary
+    search.
+
+    Parsers call seen() on every line they read, lines that were in the
+    previous snapshot can be skipped. save() replaces the stored snapshot
+    with the lines read during this run.
+    """
+
+    def __init__(self, key, path=SNAPSHOT_PATH):
+        self.path = os.path.join(
+            path, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+        self.previous = self._load()
+        self.current = array('Q')
+        self.skipped = 0
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return array('Q')
+
+        # read straight into the array, no intermediate copy of the file
+        a = array('Q', [0]) * (os.path.getsize(self.path) // 8)
+        with open(self.path, 'rb') as f:
+            f.readinto(a)
+
+        return a
+
+    def seen(self, line):
+        fp = fingerprint(line)
+        self.current.append(fp)
+
+        idx = bisect_left(self.previous, fp)
+        if idx < len(self.previous) and self.previous[idx] == fp:
+            self.skipped += 1
+            return True
+
+        return False
+
+    def save(self):
+        d = os.path.dirname(self.path)
+        if not os.path.exists(d):
+            os.makedirs(d)
+
+        with atomic_write(self.path) as f:
+            array('Q', sorted(self.current)).tofile(f)
+        logger.info(f"snapshot saved: {len(self.current)} lines, "
+                    f"{self.skipped} unchanged")
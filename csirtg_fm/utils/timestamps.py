@@ -0,0 +1,171 @@
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+import arrow
+from csirtg_dt import get as get_ts
+
+from csirtg_fm.constants import TIMESTAMP_CACHE_SIZE
+
+RE_ISO = re.compile(r'^\d{4}-\d{2}-\d{2}'
+                    r'([T ]\d{2}:\d{2}(:\d{2}(\.\d{3}|\.\d{6})?)?)?'
+                    r'(Z|[+-]\d{2}:\d{2})?$')
+RE_EPOCH = re.compile(r'^\d{10}(\.\d+)?$')
+RE_EPOCH_MILLIS = re.compile(r'^\d{13}$')
+
+# numbers (ids, ports, counters..) only pass for plausible dates
+EARLIEST = datetime(1990, 1, 1, tzinfo=timezone.utc)
+LATEST = timedelta(days=365)
+
+# strptime is lenient with the width of numeric fields ('808011' would be
+# 8080-01-01), those formats need the exact shape
+GUARDS = {
+    '%Y%m%d': re.compile(r'^\d{8}$'),
+}
+
+# tried in order when learning a column's format
+STRPTIME_FORMATS = [
+    '%Y%m%d',
+    '%d-%m-%Y',
+    '%Y/%m/%d %H:%M:%S',
+    '%Y/%m/%d',
+    '%Y-%m-%d %H:%M:%S %Z',
+    '%a, %d %b %Y %H:%M:%S %z',
+    '%d %b %Y %H:%M:%S',
+]
+
+
+def _iso(v, fmt=None):
+    if not RE_ISO.match(v):
+        raise ValueError(v)
+
+    return datetime.fromisoformat(v.replace('Z', '+00:00'))
+
+
+def _plausible(v, ts):
+    t = ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+    if not EARLIEST <= t <= datetime.now(timezone.utc) + LATEST:
+        raise ValueError(v)
+
+    return ts
+
+
+def _epoch(v, fmt=None):
+    if RE_EPOCH.match(v):
+        ts = datetime.fromtimestamp(float(v), timezone.utc)
+
+    elif RE_EPOCH_MILLIS.match(v):
+        ts = datetime.fromtimestamp(int(v) / 1000, timezone.utc)
+
+    else:
+        raise ValueError(v)
+
+    return _plausible(v, ts)
+
+
+def _strptime(v, fmt):
+    if fmt in GUARDS:
+        if not GUARDS[fmt].match(v):
+            raise ValueError(v)
+
+        return _plausible(v, datetime.strptime(v, fmt))
+
+    return datetime.strptime(v, fmt)
+
+
+def _generic(v, fmt=None):
+    # csirtg_dt takes just about anything, bare numbers (ids, ports, years)
+    # aren't worth the risk
+    if v.isdigit():
+        raise ValueError(v)
+
+    try:
+        return get_ts(v)
+    except TypeError:
+        raise ValueError(v)
+
+
+FORMATS = [(_iso, None), (_epoch, None)] + \
+    [(_strptime, f) for f in STRPTIME_FORMATS] + [(_generic, None)]
+
+
+class TimestampCache(object):
+    """ Bounded LRU of parsed timestamps, None for values that aren't """
+
+    def __init__(self, size=TIMESTAMP_CACHE_SIZE):
+        self.size = int(size)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, v):
+        with self._lock:
+            if v not in self._cache:
+                raise KeyError(v)
+
+            self._cache.move_to_end(v)
+            return self._cache[v]
+
+    def set(self, v, ts):
+        with self._lock:
+            self._cache[v] = ts
+            if len(self._cache) > self.size:
+                self._cache.popitem(last=False)
+
+
+timestamp_cache = TimestampCache()
+
+
+class Timestamps(object):
+    """
+    Parses the timestamps of a single column. The format of the first
+    value that parses (ISO-8601, epoch seconds/millis or one of the strptime
+    patterns) is learnt and tried first from then on, the full list is only
+    walked again for values that don't fit it.
+    """
+
+    def __init__(self, cache=timestamp_cache):
+        self.format = None
+        self.cache = cache
+
+    def _detect(self, v):
+        if self.format:
+            parse, fmt = self.format
+            try:
+                return parse(v, fmt)
+            except ValueError:
+                pass
+
+        for parse, fmt in FORMATS:
+            try:
+                ts = parse(v, fmt)
+            except ValueError:
+                continue
+
+            self.format = (parse, fmt)
+            return ts
+
+    def parse(self, v):
+        v = v.strip()
+
+        try:
+            ts = self.cache.get(v)
+
+        except KeyError:
+            ts = self._detect(v)
+            if ts is not None:
+                ts = arrow.get(ts)
+
+            self.cache.set(v, ts)
+
+        if ts is None:
+            raise TypeError('Invalid Timestamp: %s' % v)
+
+        return ts
+
+
+_timestamps = Timestamps()
+
+
+def parse_timestamp(v):
+    return _timestamps.parse(v)
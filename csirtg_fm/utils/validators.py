@@ -0,0 +1,39 @@
+from csirtg_indicator.constants import RE_HASH
+from csirtg_indicator.utils import is_url
+from csirtg_indicator.utils.ip import is_ipv4, is_ipv4_net, is_ipv6
+
+
+def _ipv4(v):
+    return is_ipv4(v) or is_ipv4_net(v)
+
+
+def _hash(h):
+    return lambda v: RE_HASH[h].match(v)
+
+
+# a single check per declared itype. only the types resolve_itype can't
+# confuse with one another (a hostname can pass for an fqdn and an ip..)
+VALIDATORS = {
+    'url': is_url,
+    'ipv4': _ipv4,
+    'ipv6': is_ipv6,
+    'md5': _hash('md5'),
+    'sha1': _hash('sha1'),
+    'sha256': _hash('sha256'),
+    'sha512': _hash('sha512'),
+}
+
+
+def get_validator(itype):
+    v = VALIDATORS.get(itype)
+    if not v:
+        return
+
+    def validate(s):
+        try:
+            return bool(v(s))
+
+        except (TypeError, ValueError, AttributeError):
+            return False
+
+    return validate
@@ -46,4 +46,22 @@ def test_malc0de_malware():
     pprint(indicators)
 
     assert '71941a88f8c895e405dd5cf665f1ef0c' in indicators
-#
\ No newline at end of file
+#
+
+def test_malc0de_encoding():
+    from csirtg_fm.clients.http import Client
+    from csirtg_fm.parsers.rss import Rss
+
+    # declares ISO-8859-1, is utf-8
+    cli = Client(rule, 'urls')
+    x = [i.indicator for i in s.process(rule, 'urls', 'rss', cli,
+                                        limit=None, indicators=[])]
+
+    assert x[0] == 'http://xz.job391.com/down/ï¿½ï¿½ï¿½ï¿½à¿ªï¿½ï¿½@89_1_60 (...)'
+    assert 'http://lafleur.r.perso.sfr.fr/counter/index.html?id=txv7chko-' \
+           'qdvy6hjii1_-bnyb-5qxe_4-hjukywkfngl2okfqsvuyysrzeaflgjqfztjhmkw' \
+           'd8spxabrbndy&rnd=9910661' in x
+
+    # the feedparser fallback reads it the same way
+    p = Rss(rule=cli.rule, feed='urls', cache=cli.cache)
+    assert [v for v in p._feedparser()] == [v for v in p.entries()]
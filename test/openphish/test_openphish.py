@@ -12,7 +12,7 @@ def test_openphish():
     cli = Client(rule, 'urls')
 
     parser_name = get_type(cli.cache)
-    assert parser_name == 'csv'
+    assert parser_name == 'flat'
 
     for i in s.process(rule, 'urls', parser_name, cli, limit=25,
                        indicators=[]):
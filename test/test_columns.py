@@ -0,0 +1,24 @@
+from csirtg_fm.utils.columns import get_indicator, Schema
+
+
+def test_columns_schema():
+    schema = Schema(sample=2)
+
+    for n in range(2):
+        i = get_indicator([f"192.168.1.{n}", 'scanner', 'some description'],
+                          schema=schema)
+        assert i.indicator == f"192.168.1.{n}"
+
+    assert schema.roles == ['indicator', 'string', 'string']
+
+    i = get_indicator(['example.com', 'malware', 'some description'],
+                      schema=schema)
+    assert i.indicator == 'example.com'
+    assert i.itype == 'fqdn'
+    assert i.tags == ['malware']
+    assert i.description == 'some description'
+
+    # doesn't fit the schema, classified from scratch
+    i = get_indicator(['scanner', 'some description', '192.168.1.1'],
+                      schema=schema)
+    assert i.indicator == '192.168.1.1'
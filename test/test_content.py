@@ -0,0 +1,56 @@
+import os
+
+from csirtg_fm.content import TypeCache, get_type, types_cache
+
+
+def test_content_types_cache(tmpdir):
+    f = os.path.join(str(tmpdir), 'feed.txt')
+    with open(f, 'w') as fh:
+        fh.write("http://example.com/1.html\n")
+
+    c = TypeCache(path=os.path.join(str(tmpdir), 'types.json'))
+    assert c.get(f, 'type') == (False, None)
+
+    c.set(f, 'type', 'csv')
+    assert c.get(f, 'type') == (True, 'csv')
+
+    # written once, at the end of the run
+    assert not os.path.exists(c.path)
+    c.save()
+
+    # persisted
+    c = TypeCache(path=os.path.join(str(tmpdir), 'types.json'))
+    assert c.get(f, 'type') == (True, 'csv')
+
+    # the file changed
+    with open(f, 'a') as fh:
+        fh.write("http://example.com/2.html\n")
+
+    assert c.get(f, 'type') == (False, None)
+
+
+def test_content_types_cache_prune(tmpdir):
+    files = []
+    for n in range(4):
+        files.append(os.path.join(str(tmpdir), f"feed{n}.txt"))
+        with open(files[-1], 'w') as fh:
+            fh.write("http://example.com/1.html\n")
+
+    c = TypeCache(path=os.path.join(str(tmpdir), 'types.json'), size=2)
+    for f in files:
+        c.set(f, 'type', 'flat')
+
+    os.remove(files[3])
+    c.save()
+
+    c = TypeCache(path=c.path)
+    assert [c.get(f, 'type')[0] for f in files[:3]] == [False, True, True]
+
+
+def test_content_get_type(tmpdir, monkeypatch):
+    monkeypatch.setattr(types_cache, 'path',
+                        os.path.join(str(tmpdir), 'types.json'))
+    monkeypatch.setattr(types_cache, 'entries', None)
+
+    assert get_type('test/malc0de/feed.txt') == 'rss'
+    assert get_type('test/malc0de/feed.txt') == 'rss'
@@ -0,0 +1,117 @@
+import threading
+import time
+
+from csirtg_fm.utils.fetcher import Fetcher, RetryLater, TokenBucket
+
+
+class FakeClient(object):
+    running = {}
+    peak = {}
+    lock = threading.Lock()
+
+    def __init__(self, host, cache, delay=0.2):
+        self.host = host
+        self.cache = cache
+        self.remote = f"https://{host}/{cache}"
+        self.delay = delay
+
+    def fetch(self, fetch=True):
+        with self.lock:
+            self.running[self.host] = self.running.get(self.host, 0) + 1
+            self.peak[self.host] = max(self.peak.get(self.host, 0),
+                                       self.running[self.host])
+
+        time.sleep(self.delay)
+
+        with self.lock:
+            self.running[self.host] -= 1
+
+
+def test_fetcher_concurrent():
+    clients = [FakeClient(f"host{n}.example.com", f"feed{n}")
+               for n in range(8)]
+
+    start = time.time()
+    done = list(Fetcher(workers=8).fetch(clients))
+    elapsed = time.time() - start
+
+    assert len(done) == 8
+    assert all(e is None for _, e in done)
+    assert elapsed < 0.2 * 4
+
+
+def test_fetcher_host_limit():
+    clients = [FakeClient('example.org', f"feed{n}", delay=0.05)
+               for n in range(6)]
+
+    list(Fetcher(workers=6, host_limit=2, rate=0).fetch(clients))
+
+    assert FakeClient.peak['example.org'] <= 2
+
+
+def test_fetcher_errors():
+    class Broken(FakeClient):
+        def fetch(self, fetch=True):
+            raise RuntimeError('boom')
+
+    done = list(Fetcher().fetch([Broken('example.net', 'feed')]))
+
+    assert len(done) == 1
+    assert isinstance(done[0][1], RuntimeError)
+
+
+def test_fetcher_retry():
+    class Flaky(FakeClient):
+        attempts = 0
+
+        def fetch(self, fetch=True):
+            self.attempts += 1
+            if self.attempts == 1:
+                raise RetryLater(429, retry_after=0.2)
+
+    flaky = Flaky('flaky.example.com', 'feed', delay=0)
+    ok = FakeClient('ok.example.com', 'feed', delay=0.05)
+
+    done = list(Fetcher().fetch([flaky, ok]))
+
+    # the rate limited feed doesn't hold up the others
+    assert done[0] == (ok, None)
+    assert done[1] == (flaky, None)
+    assert flaky.attempts == 2
+
+
+def test_fetcher_retries_exhausted():
+    class Down(FakeClient):
+        def fetch(self, fetch=True):
+            raise RetryLater(503, retry_after=0)
+
+    done = list(Fetcher(retries=2).fetch([Down('down.example.com', 'f')]))
+
+    assert isinstance(done[0][1], RetryLater)
+
+
+def test_fetcher_retry_after_too_long():
+    class Busy(FakeClient):
+        attempts = 0
+
+        def fetch(self, fetch=True):
+            self.attempts += 1
+            raise RetryLater(429, retry_after=3600)
+
+    busy = Busy('busy.example.com', 'feed')
+
+    start = time.time()
+    done = list(Fetcher(max_delay=60).fetch([busy]))
+
+    assert time.time() - start < 1
+    assert busy.attempts == 1
+    assert isinstance(done[0][1], RetryLater)
+
+
+def test_token_bucket():
+    b = TokenBucket(rate=10, burst=1)
+    now = time.monotonic()
+
+    assert b.consume(now=now) == 0
+    assert b.consume(now=now) > 0
+    assert b.consume(now=now + 0.2) == 0
@@ -0,0 +1,321 @@
+import os
+
+from csirtg_fm import FM
+from csirtg_fm.archiver import Archiver
+from csirtg_fm.clients.http import Client
+from csirtg_fm.content import get_type
+
+rule = 'test/openphish/openphish.yml'
+
+
+def _process(s, limit=25):
+    cli = Client(rule, 'urls')
+    parser_name = get_type(cli.cache)
+    return list(s.process(rule, 'urls', parser_name, cli, limit=limit))
+
+
+def test_fm_unchanged_feed(tmpdir):
+    archiver = Archiver(dbfile=os.path.join(str(tmpdir), 'fm.db'))
+
+    assert len(_process(FM(archiver=archiver))) > 0
+
+    # nothing changed, the feed isn't even parsed
+    assert _process(FM(archiver=archiver)) == []
+
+    # a different limit is a different run
+    assert len(_process(FM(archiver=archiver), limit=50)) > 0
+
+    # forced, parsed again but everything is already archived
+    s = FM(archiver=archiver, force=True)
+    assert _process(s) == []
+    assert archiver.get_digest(f"{Client(rule, 'urls').cache}:urls")
+
+
+def test_fm_incremental(tmpdir):
+    feed = os.path.join(str(tmpdir), 'feed.txt')
+    with open('test/openphish/feed.txt') as f:
+        lines = f.readlines()[:50]
+
+    with open(feed, 'w') as f:
+        f.writelines(l.rstrip("\n") + "\n" for l in lines)
+
+    def _run(incremental=True):
+        r = {'feeds': {'urls': {'remote': feed,
+                                'defaults': {'tags': 'phishing'}}}}
+        cli = Client(r, 'urls')
+        s = FM(incremental=incremental,
+               snapshot_path=os.path.join(str(tmpdir), 'snapshots'))
+        return list(s.process(r, 'urls', 'pattern', cli, limit=None))
+
+    assert len(_run()) == len(_run(incremental=False))
+    assert _run() == []
+
+    with open(feed, 'a') as f:
+        f.write("http://example.com/1.html\nhttp://example.com/2.html\n")
+
+    x = _run()
+    assert [i.indicator for i in x] == ['http://example.com/1.html',
+                                        'http://example.com/2.html']
+
+
+def test_fm_reverse(tmpdir):
+    feed = os.path.join(str(tmpdir), 'feed.txt')
+    with open(feed, 'w') as f:
+        for n in range(1000):
+            f.write(f"example{n}.com\tmalware\n")
+
+    r = {'feeds': {'domains': {'remote': feed, 'reverse': '1',
+                               'values': ['indicator', 'description']}}}
+    cli = Client(r, 'domains')
+    x = list(FM().process(r, 'domains', 'tsv', cli, limit=3))
+
+    assert [i.indicator for i in x] == ['example999.com', 'example998.com',
+                                        'example997.com']
+
+
+def test_fm_json_map(tmpdir):
+    feed = os.path.join(str(tmpdir), 'feed.json')
+    with open(feed, 'w') as f:
+        f.write('{"results": [{"host": "example.com", "seen": '
+                '"2018-08-20T17:58:00Z", "note": "malware"}, {"host": null}, '
+                '{"host": "192.168.1.1", "note": "scanner"}]}')
+
+    r = {'feeds': {'hosts': {'remote': feed, 'envelope': 'results',
+                             'map': ['host', 'seen', 'note'],
+                             'values': ['indicator', 'last_at',
+                                        'description']}}}
+    cli = Client(r, 'hosts')
+    x = list(FM().process(r, 'hosts', 'json', cli, limit=None))
+
+    assert [i.indicator for i in x] == ['example.com', '192.168.1.1']
+    assert x[0].last_at.year == 2018
+    assert x[1].description == 'scanner'
+
+
+def test_fm_xml(tmpdir):
+    feed = os.path.join(str(tmpdir), 'feed.xml')
+    with open(feed, 'w') as f:
+        f.write('<?xml version="1.0"?>\n'
+                '<feed xmlns="http://www.w3.org/2005/Atom">\n'
+                '<title>test</title>\n')
+        for n in range(100):
+            f.write(f'<entry><title>example{n}.com</title>'
+                    f'<link href="https://example.org/{n}"/>'
+                    f'<summary>host: example{n}.com</summary></entry>\n')
+        f.write('</feed>\n')
+
+    r = {'feeds': {'hosts': {'remote': feed, 'map': {
+        'summary': {'pattern': r'^host: (\S+)$', 'values': ['indicator']},
+        'link': {'pattern': r'(\S+)', 'values': ['reference']}}}}}
+    cli = Client(r, 'hosts')
+    x = list(FM().process(r, 'hosts', 'xml', cli, limit=10))
+
+    assert len(x) == 10
+    assert x[0].indicator == 'example0.com'
+    assert x[0].reference == 'https://example.org/0'
+
+
+def test_fm_xml_malformed(tmpdir):
+    feed = os.path.join(str(tmpdir), 'feed.xml')
+    with open(feed, 'w') as f:
+        f.write('<?xml version="1.0"?>\n<rss version="2.0"><channel>\n')
+        for n in range(2000):
+            desc = 'bad&nbsp;entity' if n == 1500 else 'ok'
+            f.write(f'<item><title>{desc}</title>'
+                    f'<description>host: example{n}.com</description>'
+                    f'</item>\n')
+        f.write('</channel></rss>\n')
+
+    r = {'feeds': {'hosts': {'remote': feed, 'map': {
+        'description': {'pattern': r'^host: (\S+)$',
+                        'values': ['indicator']}}}}}
+    cli = Client(r, 'hosts')
+    x = list(FM().process(r, 'hosts', 'rss', cli, limit=None))
+
+    assert [i.indicator for i in x] == [f"example{n}.com"
+                                        for n in range(2000)]
+
+
+def test_fm_csv_quoting(tmpdir):
+    feed = os.path.join(str(tmpdir), 'feed.csv')
+    with open(feed, 'w') as f:
+        f.write('# id,url,description\n'
+                '"1","http://example.com/a,b.exe","dropper, ""stage 1"""\n'
+                '"2","http://example.com/c.exe","multi\nline"\n')
+
+    r = {'feeds': {'urls': {'remote': feed,
+                            'values': [None, 'indicator', 'description']}}}
+    cli = Client(r, 'urls')
+    x = list(FM().process(r, 'urls', 'csv', cli, limit=None))
+
+    assert [i.indicator for i in x] == ['http://example.com/a,b.exe',
+                                        'http://example.com/c.exe']
+    assert x[0].description == 'dropper, "stage 1"'
+    assert x[1].description == 'multi\nline'
+
+
+def test_fm_csv_multiline(tmpdir):
+    feed = os.path.join(str(tmpdir), 'feed.csv')
+    with open(feed, 'w') as f:
+        f.write('# url,description\n'
+                '"http://example.com/a.exe","line one\n# not a comment\n'
+                '\n  indented three"\n'
+                '\n'
+                '"http://example.com/b.exe","malware\nskipped"\n'
+                '"http://example.com/c.exe","malware"\n')
+
+    r = {'feeds': {'urls': {'remote': feed, 'skip': 'skipped"$',
+                            'values': ['indicator', 'description']}}}
+    cli = Client(r, 'urls')
+    x = list(FM().process(r, 'urls', 'csv', cli, limit=None))
+
+    assert [i.indicator for i in x] == ['http://example.com/a.exe',
+                                        'http://example.com/c.exe']
+    assert x[0].description == 'line one\n# not a comment\n\n' \
+                               '  indented three'
+
+
+def test_fm_pattern_finditer(tmpdir):
+    feed = os.path.join(str(tmpdir), 'feed.txt')
+    with open(feed, 'wb') as f:
+        f.write(b'# comment\r\nexample.com\r\n\r\nexample.net  \r\n'
+                b'not a match\r\n192.168.1.1')
+
+    r = {'feeds': {'hosts': {'remote': feed}}}
+    cli = Client(r, 'hosts')
+    x = list(FM().process(r, 'hosts', 'pattern', cli, limit=None))
+
+    assert [i.indicator for i in x] == ['example.com', 'example.net',
+                                        '192.168.1.1']
+
+
+def test_fm_prefilter(tmpdir):
+    feed = os.path.join(str(tmpdir), 'feed.txt')
+    with open(feed, 'w') as f:
+        f.write("# example0.com\tbotnet\n"
+                "example1.com\tbotnet\n"
+                "example2.com\tphishing\n"
+                "example3.com\tbotnet,ignored\n"
+                "example4.com\tbotnet\n")
+
+    r = {'feeds': {'domains': {'remote': feed, 'line_filter': 'botnet',
+                               'skip': 'ignored$'}}}
+    cli = Client(r, 'domains')
+    x = list(FM().process(r, 'domains', 'tsv', cli, limit=None))
+
+    assert [i.indicator for i in x] == ['example1.com', 'example4.com']
+
+
+def test_fm_prefilter_crlf(tmpdir):
+    feed = os.path.join(str(tmpdir), 'feed.txt')
+    with open(feed, 'wb') as f:
+        f.write(b"example1.com # botnet\r\n"
+                b"example3.com # botnet,ignored\r\n"
+                b"example4.com # botnet\r\n")
+
+    r = {'feeds': {'domains': {'remote': feed, 'skip': 'ignored$'}}}
+    cli = Client(r, 'domains')
+    x = list(FM().process(r, 'domains', 'flat', cli, limit=None))
+
+    assert [i.indicator for i in x] == ['example1.com', 'example4.com']
+
+
+def test_fm_process_ranges(tmpdir):
+    feed = os.path.join(str(tmpdir), 'feed.txt')
+    with open(feed, 'w') as f:
+        f.write("# domain,description\n")
+        for n in range(5000):
+            f.write(f"example{n}.com,some description {n}\n")
+
+    r = {'feeds': {'domains': {'remote': feed,
+                               'values': ['indicator', 'description']}}}
+    cli = Client(r, 'domains')
+    s = FM()
+
+    x = list(s.process_ranges('csv', r, 'domains', cli.cache, workers=3))
+    assert len(x) == 5000
+    assert [i.indicator for i in x] == [f"example{n}.com"
+                                           for n in range(5000)]
+
+
+def test_fm_splittable(tmpdir, monkeypatch):
+    import csirtg_fm
+    from csirtg_fm.parsers.csv import Csv
+
+    monkeypatch.setattr(csirtg_fm, 'PARSER_WORKERS', 4)
+    monkeypatch.setattr(csirtg_fm, 'PARSER_SPLIT_SIZE', 0)
+
+    feed = os.path.join(str(tmpdir), 'feed.txt')
+    with open(feed, 'w') as f:
+        f.write("example.com,malware\n")
+
+    r = {'feeds': {'domains': {'remote': feed}}}
+    p = Csv(rule=r, feed='domains', cache=feed)
+
+    assert FM().is_splittable(p)
+
+    # a limited run reads the head of the feed
+    assert not FM().is_splittable(p, limit=25)
+
+
+def test_fm_declared_itype(tmpdir, monkeypatch):
+    from csirtg_fm.parsers import delim
+    from csirtg_fm.parsers.csv import Csv
+
+    feed = os.path.join(str(tmpdir), 'feed.txt')
+    with open(feed, 'w') as f:
+        f.write("192.168.1.1,scanner\n"
+                "example.com,scanner\n"
+                "192.168.1.0/24,scanner\n"
+                "2001:db8::1,scanner\n")
+
+    r = {'feeds': {'ipv4': {'remote': feed, 'itype': 'ipv4',
+                            'values': ['indicator', 'description']}}}
+
+    # built from the rule's columns, rows are never classified
+    def _classify(*args, **kwargs):
+        raise AssertionError('classified')
+
+    monkeypatch.setattr(delim, 'get_indicator', _classify)
+
+    p = Csv(rule=r, feed='ipv4', cache=feed)
+    x = list(p.process())
+
+    assert [i.indicator for i in x] == ['192.168.1.1', '192.168.1.0/24']
+    assert set(i.itype for i in x) == {'ipv4'}
+    assert set(i.description for i in x) == {'scanner'}
+    assert p.rejected == 2
+
+
+def test_fm_flat(tmpdir):
+    feed = os.path.join(str(tmpdir), 'feed.txt')
+    with open(feed, 'w') as f:
+        f.write("# blocklist\n"
+                "\n"
+                "  192.168.1.1  \n"
+                "192.168.1.2 ; scanner\n"
+                "not an indicator\n"
+                "192.168.1.3\n")
+
+    r = {'feeds': {'ips': {'remote': feed, 'defaults': {'tags': 'scanner'}}}}
+    cli = Client(r, 'ips')
+    x = list(FM().process(r, 'ips', 'flat', cli, limit=None))
+
+    assert [i.indicator for i in x] == ['192.168.1.1', '192.168.1.2',
+                                        '192.168.1.3']
+    assert [i.tags for i in x] == [['scanner']] * 3
+    assert len(set(i.uuid for i in x)) == 3
+
+
+def test_fm_flat_reverse(tmpdir):
+    feed = os.path.join(str(tmpdir), 'feed.txt')
+    with open(feed, 'w') as f:
+        for n in range(100):
+            f.write(f"example{n}.com\n")
+
+    r = {'feeds': {'domains': {'remote': feed, 'reverse': '1'}}}
+    cli = Client(r, 'domains')
+    x = list(FM().process(r, 'domains', 'flat', cli, limit=3))
+
+    assert [i.indicator for i in x] == ['example99.com', 'example98.com',
+                                        'example97.com']
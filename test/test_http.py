@@ -0,0 +1,140 @@
+import bz2
+import gzip
+import os
+
+import pytest
+
+from csirtg_fm.clients.http import Client
+from csirtg_fm.utils.decoders import write_stream, MODE
+
+FEED = b"http://example.com/1.html\nhttp://example.com/2.html\n"
+
+
+def _rule(remote='https://example.com/feed.txt'):
+    return {'feeds': {'urls': {'remote': remote}}}
+
+
+class FakeResponse(object):
+    def __init__(self, status_code, content=b'', headers={}):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+
+    def iter_content(self, size):
+        for n in range(0, len(self.content), size):
+            yield self.content[n:n + size]
+
+
+class FakeSession(object):
+    def __init__(self, content=FEED, headers={}):
+        self.requests = []
+        self.content = content
+        self.headers = headers
+
+    def get(self, remote, headers={}, **kwargs):
+        self.requests.append(headers)
+
+        if headers.get('If-None-Match') == '"1234"':
+            return FakeResponse(304)
+
+        return FakeResponse(200, self.content,
+                            headers=dict(self.headers, ETag='"1234"'))
+
+
+def _expire(cli):
+    os.utime(cli.cache, (0, 0))
+
+
+def test_http_conditional_get(tmpdir):
+    cli = Client(_rule(), 'urls', cache=str(tmpdir))
+    cli.handle = FakeSession()
+
+    cli.fetch()
+    assert os.path.exists(cli.meta)
+    with open(cli.cache, 'rb') as f:
+        assert f.read() == FEED
+
+    _expire(cli)
+    cli.fetch()
+
+    assert len(cli.handle.requests) == 2
+    assert cli.handle.requests[1]['If-None-Match'] == '"1234"'
+
+    # 304, cache is current and the freshness window is reset
+    with open(cli.cache, 'rb') as f:
+        assert f.read() == FEED
+    assert os.stat(cli.cache).st_mtime > 0
+
+
+def test_http_gzip_stream(tmpdir):
+    cli = Client(_rule('https://example.com/feed.txt.gz'), 'urls',
+                 cache=str(tmpdir))
+    cli.handle = FakeSession(gzip.compress(FEED))
+
+    cli.fetch()
+
+    assert cli.cache.endswith('feed.txt')
+    with open(cli.cache, 'rb') as f:
+        assert f.read() == FEED
+
+    # the next run picks up the decompressed cache
+    cli = Client(_rule('https://example.com/feed.txt.gz'), 'urls',
+                 cache=str(tmpdir))
+    assert cli.cache.endswith('feed.txt')
+
+
+def test_http_content_encoding(tmpdir):
+    # Content-Encoding: gzip, requests hands over the decoded body
+    for ctype in ['application/x-gzip', 'application/zip']:
+        cli = Client(_rule(), 'urls', cache=str(tmpdir))
+        cli.handle = FakeSession(headers={'Content-Type': ctype})
+
+        cli.fetch()
+        with open(cli.cache, 'rb') as f:
+            assert f.read() == FEED
+
+        _expire(cli)
+        os.remove(cli.meta)
+
+
+def _blocks(data, size=3):
+    return [data[n:n + size] for n in range(0, len(data), size)]
+
+
+def test_http_write_stream(tmpdir):
+    path = os.path.join(str(tmpdir), 'feed.txt.gz')
+
+    # concatenated members
+    data = gzip.compress(b"a.com\n") + gzip.compress(b"b.com\n")
+    with open(write_stream(_blocks(data), path), 'rb') as f:
+        assert f.read() == b"a.com\nb.com\n"
+
+    data = bz2.compress(b"a.com\n") + bz2.compress(b"b.com\n")
+    with open(write_stream(_blocks(data), path + '.bz2'), 'rb') as f:
+        assert f.read() == b"a.com\nb.com\n"
+
+    assert os.stat(path[:-3]).st_mode & 0o777 == MODE
+
+
+def test_http_write_stream_error(tmpdir):
+    def blocks():
+        yield FEED
+        raise IOError('connection reset')
+
+    path = os.path.join(str(tmpdir), 'feed.txt')
+    with pytest.raises(IOError):
+        write_stream(blocks(), path)
+
+    assert os.listdir(str(tmpdir)) == []
+
+
+def test_http_shared_session(tmpdir):
+    c1 = Client(_rule('https://example.com/feed1.txt'), 'urls',
+                cache=str(tmpdir))
+    c2 = Client(_rule('https://example.com/feed2.txt'), 'urls',
+                cache=str(tmpdir))
+    c3 = Client(_rule('https://example.org/feed1.txt'), 'urls',
+                cache=str(tmpdir))
+
+    assert c1.handle is c2.handle
+    assert c1.handle is not c3.handle
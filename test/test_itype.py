@@ -0,0 +1,36 @@
+import pytest
+
+import csirtg_indicator.utils
+
+from csirtg_fm.utils.itype import ItypeCache, itype_cache, resolve_itype
+from csirtg_fm.utils.record import Record
+
+
+def test_itype_cache():
+    c = ItypeCache(size=2)
+
+    assert c.resolve('example.com') == 'fqdn'
+    assert c.resolve('example.com') == 'fqdn'
+
+    for _ in range(2):
+        with pytest.raises(TypeError):
+            c.resolve('not an indicator')
+
+    assert c.stats() == {'hits': 2, 'misses': 2, 'size': 2}
+
+    # least recently used is evicted
+    c.resolve('192.168.1.1')
+    assert c.stats()['size'] == 2
+    c.resolve('example.com')
+    assert c.stats()['misses'] == 4
+
+
+def test_itype_cache_record():
+    hits = itype_cache.hits
+    Record(indicator='example.org')
+    Record(indicator='example.org')
+
+    assert itype_cache.hits > hits
+
+    # csirtg_indicator itself is left alone
+    assert csirtg_indicator.utils.resolve_itype is not resolve_itype
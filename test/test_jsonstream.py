@@ -0,0 +1,32 @@
+import io
+import json
+
+from csirtg_fm.utils.jsonstream import iter_json
+
+RECORDS = [{'indicator': f"example{n}.com", 'tags': ['malware']}
+           for n in range(10)]
+
+
+def test_jsonstream_array():
+    f = io.StringIO(json.dumps(RECORDS))
+    assert list(iter_json(f, blocksize=7)) == RECORDS
+
+
+def test_jsonstream_envelope():
+    doc = {'meta': {'count': 10}, 'data': RECORDS, 'after': [1, 2]}
+    f = io.StringIO(json.dumps(doc))
+    assert list(iter_json(f, envelope='data', blocksize=7)) == RECORDS
+
+
+def test_jsonstream_ndjson():
+    f = io.StringIO("\n".join(json.dumps(r) for r in RECORDS) + "\n")
+    assert list(iter_json(f, blocksize=7)) == RECORDS
+
+
+def test_jsonstream_lazy():
+    f = io.StringIO(json.dumps(RECORDS))
+    g = iter_json(f, blocksize=16)
+    next(g)
+
+    # only what's been needed so far has been read
+    assert f.tell() < len(f.getvalue())
@@ -0,0 +1,49 @@
+import pytest
+
+from csirtg_fm.utils.rules import load_rules, compile_rule
+
+RULE = 'test/malwaredomains/malwaredomains.yml'
+
+
+def test_rules_compile():
+    rule, _, _ = next(load_rules(RULE))
+
+    s = compile_rule(rule, 'malware')
+    assert dict(s.defaults)['tags'] == ('exploit', 'malware')
+    assert dict(s.defaults)['provider'] == 'malwaredomains.com'
+    assert s.line_filter.search('malicious')
+    assert s.reference == 'test/malwaredomains/domains.zip'
+
+    s = compile_rule(rule, 'registrars')
+    assert s.columns == ((0, 'indicator'), (1, 'reference'))
+    assert s.pattern.search('*.example.com #http://example.com')
+
+    with pytest.raises(AttributeError):
+        s.limit = 10
+
+
+def test_rules_shared():
+    rule, _, _ = next(load_rules(RULE))
+
+    # feeds loaded together share the rule dict
+    compile_rule(rule, 'phishing')
+    s = compile_rule(rule, 'registrars')
+
+    assert 'confidence' not in dict(s.defaults)
+    assert rule['defaults'] == {'provider': 'malwaredomains.com'}
+
+
+def test_rules_columns():
+    rule = {'defaults': {'values': ['indicator', 'description'],
+                         'description': 'scanner'},
+            'feeds': {'a': {}, 'b': {'values': ['indicator', None, 'tags']}}}
+
+    # delim: the rule's values don't override the defaults
+    s = compile_rule(rule, 'a')
+    assert s.columns == ((0, 'indicator'),)
+    assert s.pattern_columns == ((0, 'indicator'), (1, 'description'))
+
+    # pattern: the feed's values replace the rule's
+    s = compile_rule(rule, 'b')
+    assert s.columns == ((0, 'indicator'), (2, 'tags'))
+    assert s.pattern_columns == ((0, 'indicator'), (2, 'tags'))
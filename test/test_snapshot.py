@@ -0,0 +1,18 @@
+import os
+
+from csirtg_fm.utils.snapshot import Snapshot
+
+
+def test_snapshot(tmpdir):
+    s = Snapshot('feed', path=str(tmpdir))
+    assert not any(s.seen(f"example{n}.com") for n in range(100))
+    s.save()
+
+    assert os.path.getsize(s.path) == 100 * 8
+
+    s = Snapshot('feed', path=str(tmpdir))
+    assert list(s.previous) == sorted(s.previous)
+
+    assert s.seen('example42.com')
+    assert not s.seen('example100.com')
+    assert s.skipped == 1
@@ -0,0 +1,27 @@
+import pytest
+
+from csirtg_fm.utils.timestamps import Timestamps, TimestampCache, \
+    parse_timestamp
+
+
+def test_timestamps():
+    assert parse_timestamp('2018-08-20 17:58:00').year == 2018
+    assert parse_timestamp('2016-03-26T12:17:32+00:00').hour == 12
+    assert parse_timestamp('1534787880').year == 2018
+    assert parse_timestamp('1534787880123').year == 2018
+    assert parse_timestamp('20160401').month == 4
+
+    # ids, ports.. that strptime or epoch would take
+    for v in ['44667', '2018', 'malware', '12.5', '808011', '80801101',
+              '9999999999', '9999999999999']:
+        with pytest.raises(TypeError):
+            parse_timestamp(v)
+
+
+def test_timestamps_format():
+    ts = Timestamps(cache=TimestampCache())
+    ts.parse('2018/08/20 17:58:00')
+    assert ts.format[1] == '%Y/%m/%d %H:%M:%S'
+
+    assert ts.parse('2018/08/21 17:58:00').day == 21
+    assert ts.format[1] == '%Y/%m/%d %H:%M:%S'